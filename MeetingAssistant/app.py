@@ -1,7 +1,7 @@
 import PySimpleGUI as sg
 import subprocess, os
 from transcribe import transcribe
-from summarize  import summarize
+from summarize  import summarize_stream
 from search import build_faiss_index, query_faiss
 from query_parser import extract_keywords
 import openai
@@ -74,7 +74,11 @@ while True:
 
             # Summarize
             sg.popup("Summarizing…")
-            summarize(str(txt), str(summ))
+            window["-RESULTS-"].update("")
+            for piece in summarize_stream(str(txt), str(summ)):
+                # Append to the result pane as the summary is generated
+                window["-RESULTS-"].update(piece, append=True)
+                window.refresh()
 
             # 🧠 Build FAISS index after summarization
             sg.popup("Updating search index…")
@@ -1,16 +1,62 @@
 import os
 import re
+import time
+import asyncio
+import logging
 import datetime
+import threading
 from telegram import Update, ChatAction
+from telegram.error import TelegramError
 from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
 
 # Import modules from the MeetingAssistant project
 from transcribe import transcribe
-from summarize import summarize
+from summarize import summarize_text_stream
 from search import search
 
 # --- Configuration placeholders ---
 TELEGRAM_BOT_TOKEN = "YOUR_TELEGRAM_BOT_TOKEN_HERE"  # <-- Set your bot token
+SUMMARY_EDIT_SECONDS = 1.5  # minimum time between edits of the streamed summary message
+
+async def edit_summary(reply, text: str):
+    """Edits the summary message; a failed edit is skipped and the next one catches up"""
+    try:
+        await reply.edit_text(text[:4000])
+    except TelegramError as e:  # rate limited, message gone or text unchanged
+        logging.debug(f"Summary edit failed: {e}")
+
+async def stream_summary(message, transcript_text: str) -> str:
+    """
+    Summarizes the transcript while editing one reply with the text generated so far.
+    Returns the complete summary.
+    """
+    reply = await message.reply_text("Summary:\n…")
+    stream = summarize_text_stream(transcript_text)
+    stream_lock = threading.Lock()
+
+    def pull():
+        with stream_lock:
+            return next(stream, None)
+
+    def close():
+        with stream_lock:  # after a token still being generated, if we were cancelled
+            stream.close()
+
+    loop = asyncio.get_running_loop()
+    summary, last_edit = "", time.monotonic()
+    try:
+        # Tokens come from a blocking generator, so pull them on the executor
+        while (piece := await loop.run_in_executor(None, pull)) is not None:
+            summary += piece
+            if time.monotonic() - last_edit >= SUMMARY_EDIT_SECONDS:
+                await edit_summary(reply, "Summary:\n" + summary + " …")
+                last_edit = time.monotonic()
+    finally:
+        # Closing the generator returns its llama model to the pool
+        loop.run_in_executor(None, close)
+    summary = summary.strip()
+    await edit_summary(reply, "Summary:\n" + summary)
+    return summary
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -29,7 +75,7 @@ async def handle_media(update: Update, context: ContextTypes.DEFAULT_TYPE):
     - Transcribes it via whisper.cpp (transcribe).
     - Summarizes via orca-mini-3b (summarize).
     - Stores results under meetings/YYYY/MM/DD-title/.
-    - Replies with the transcript and summary.
+    - Replies with the transcript, then streams the summary into one message.
     """
     # Show a 'recording audio' action while processing
     await context.bot.send_chat_action(chat_id=update.effective_chat.id, action=ChatAction.RECORD_AUDIO)
@@ -59,9 +105,6 @@ async def handle_media(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Transcribe the file (using the external transcription module)
     transcript_text = transcribe(temp_filename)
 
-    # Summarize the transcript (using the external summarization module)
-    summary_text = summarize(transcript_text)
-
     # Determine the meeting title from caption or filename, or use a default
     if caption_title:
         title = caption_title
@@ -86,8 +129,6 @@ async def handle_media(update: Update, context: ContextTypes.DEFAULT_TYPE):
     summary_path = os.path.join(dir_path, "summary.txt")
     with open(transcript_path, "w", encoding="utf-8") as f:
         f.write(transcript_text)
-    with open(summary_path, "w", encoding="utf-8") as f:
-        f.write(summary_text)
 
     # Remove the temporary downloaded file
     try:
@@ -95,15 +136,17 @@ async def handle_media(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except OSError:
         pass
 
-    # Reply with the transcript and summary.
+    # Reply with the transcript.
     # Split into chunks if messages exceed Telegram's limit (~4096 chars).
     transcript_message = "Transcript:\n" + transcript_text
     for i in range(0, len(transcript_message), 4000):
         await update.message.reply_text(transcript_message[i:i+4000])
 
-    summary_message = "Summary:\n" + summary_text
-    for i in range(0, len(summary_message), 4000):
-        await update.message.reply_text(summary_message[i:i+4000])
+    # Summarize the transcript (using the external summarization module),
+    # showing the summary in one message as it is generated
+    summary_text = await stream_summary(update.message, transcript_text)
+    with open(summary_path, "w", encoding="utf-8") as f:
+        f.write(summary_text)
 
 async def handle_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -86,7 +86,14 @@ while True:
             shutil.copy(file_path, meeting_folder)
             # Transcribe and summarize
             transcript = transcription.transcribe(file_path)
-            summary = summarization.summarize(transcript)
+            # Show the summary in the result pane as it is generated
+            window['-RESULT-'].update('')
+            summary = ''
+            for piece in summarization.summarize_text_stream(transcript):
+                summary += piece
+                window['-RESULT-'].print(piece, end='')
+                window.refresh()
+            summary = summary.strip()
             # Save outputs
             with open(os.path.join(meeting_folder, 'transcript.txt'), 'w', encoding='utf-8') as f:
                 f.write(transcript)
@@ -1,46 +1,261 @@
 # modules/summarize.py
 from llama_cpp import Llama
 import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
 
 # Path to your downloaded GGUF model
-MODEL_PATH = "models/orca-mini-3b-gguf2-q4_0.gguf"
+MODEL_PATH = os.getenv("LLAMA_MODEL_PATH", "models/orca-mini-3b-gguf2-q4_0.gguf")
 
-def summarize(transcript_path: str, summary_path: str):
-    """
-    Loads the orca-mini model and summarizes the meeting transcript.
-    """
+# Context window, CPU threads and prompt batch size of each model instance
+N_CTX = int(os.getenv("LLAMA_N_CTX", "2048"))
+N_THREADS = int(os.getenv("LLAMA_THREADS", str(max((os.cpu_count() or 2) // 2, 1))))
+N_BATCH = int(os.getenv("LLAMA_BATCH", "512"))
+MAX_TOKENS = 256
+
+# Model instances kept loaded for the life of the process. "auto" fits as many
+# as LLAMA_POOL_RAM_MB (0 = half of the available memory) and the CPU allow.
+POOL_SIZE = os.getenv("LLAMA_POOL_SIZE", "auto")
+POOL_RAM_MB = int(os.getenv("LLAMA_POOL_RAM_MB", "0"))
+
+# Fixed instruction prefixes: evaluated once per instance, then restored from
+# the saved KV state so each call only evaluates the transcript tokens
+SUMMARY_PREFIX = (
+    "You are a summarization assistant. "
+    "Read the following meeting transcript and produce a concise bullet-point summary:\n\n"
+)
+COMBINE_PREFIX = (
+    "You are a summarization assistant. "
+    "The following are bullet-point summaries of consecutive parts of one meeting. "
+    "Combine them into a single concise bullet-point summary:\n\n"
+)
+SUFFIX = "\n\nSummary:\n-"
+
+def _available_memory() -> int:
+    """Available RAM in bytes (0 if it can't be read)"""
     try:
-    # Read transcript text
-        text = open(transcript_path, encoding="utf-8").read()
-    
-        # Instantiate llama.cpp model
-        llama = Llama(model_path=MODEL_PATH)
-    
-        # Build prompt for summarization
-        prompt = (
-            "You are a summarization assistant. "
-            "Read the following meeting transcript and produce a concise bullet-point summary:\n\n"
-            f"{text}\n\nSummary:\n-"
+        with open("/proc/meminfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return 0
+
+def pool_size() -> int:
+    """How many model instances to keep loaded"""
+    if POOL_SIZE != "auto":
+        return max(int(POOL_SIZE), 1)
+    budget = POOL_RAM_MB * 1024 * 1024 or _available_memory() // 2
+    # Each instance is counted at the model's file size: the weights are
+    # mmapped and shared, so this leaves room for its KV cache and buffers
+    try:
+        per_model = os.path.getsize(MODEL_PATH)
+    except OSError:
+        return 1
+    by_ram = budget // per_model if per_model else 1
+    by_cpu = (os.cpu_count() or 1) // N_THREADS
+    return max(min(by_ram, by_cpu), 1)
+
+class _Model:
+    """One loaded Llama instance and the saved KV states of its prompt prefixes"""
+
+    def __init__(self):
+        start = time.perf_counter()
+        self.llama = Llama(
+            model_path=MODEL_PATH, n_ctx=N_CTX, n_threads=N_THREADS, n_batch=N_BATCH, verbose=False,
         )
-    
-        # Generate completion
-        response = llama(
+        self.prefixes = {}
+        print(f"[✓] Loaded {MODEL_PATH} in {time.perf_counter() - start:.1f}s "
+              f"(n_ctx={N_CTX}, n_threads={N_THREADS}, n_batch={N_BATCH})")
+
+    def tokenize(self, text: str, bos: bool = False) -> list[int]:
+        return self.llama.tokenize(text.encode("utf-8"), add_bos=bos)
+
+    def prime(self, prefix: str) -> list[int]:
+        """Load the KV state of `prefix` (evaluating it the first time) and return its tokens"""
+        cached = self.prefixes.get(prefix)
+        if cached is None:
+            tokens = self.tokenize(prefix, bos=True)
+            self.llama.reset()
+            self.llama.eval(tokens)
+            cached = self.prefixes[prefix] = (tokens, self.llama.save_state())
+            _count(prefix_evaluations=1)
+        else:
+            self.llama.load_state(cached[1])
+            _count(prefix_reuses=1)
+        return cached[0]
+
+    def complete_stream(self, prefix: str, tokens: list[int]):
+        """Stream the completion of prefix + tokens + SUFFIX, one token's text at a time;
+        llama.cpp skips the primed prefix tokens"""
+        prompt = self.prime(prefix) + tokens + self.tokenize(SUFFIX)
+        chunks = self.llama.create_completion(
             prompt=prompt,
-            max_tokens=256,          # adjust as needed
+            max_tokens=MAX_TOKENS,
             stop=["\n\n"],           # stop after summary block
+            stream=True,
         )
-    
-        summary = response["choices"][0]["text"].strip()
-    
+        _count(completions=1, prompt_tokens=len(prompt))
+        for chunk in chunks:
+            yield chunk["choices"][0]["text"]
+
+    def complete(self, prefix: str, tokens: list[int]) -> str:
+        return "".join(self.complete_stream(prefix, tokens)).strip()
+
+class ModelPool:
+    """Process-wide pool of loaded models, created on first use up to `size`"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.idle = queue.Queue()
+        self.loaded = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def model(self):
+        """Borrow an instance for one call (llama.cpp contexts are not thread-safe)"""
+        try:
+            model = self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                grow = self.loaded < self.size
+                if grow:
+                    self.loaded += 1
+            if grow:
+                try:
+                    model = _Model()
+                except Exception:
+                    with self.lock:
+                        self.loaded -= 1
+                    raise
+            else:
+                model = self.idle.get()
+        try:
+            yield model
+        finally:
+            self.idle.put(model)
+
+_pool = None
+_pool_lock = threading.Lock()
+stats = {"completions": 0, "prompt_tokens": 0, "prefix_evaluations": 0, "prefix_reuses": 0}
+
+def _count(**deltas):
+    with _pool_lock:
+        for key, value in deltas.items():
+            stats[key] += value
+
+def get_pool() -> ModelPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool(pool_size())
+        return _pool
+
+def pool_stats() -> dict:
+    pool = get_pool()
+    return {
+        "pool_size": pool.size, "loaded": pool.loaded, "n_ctx": N_CTX,
+        "n_threads": N_THREADS, "n_batch": N_BATCH, **stats,
+    }
+
+def _budget(model: _Model, prefix: str) -> int:
+    """Transcript tokens that fit in one prompt next to `prefix`, SUFFIX and the output"""
+    overhead = len(model.tokenize(prefix, bos=True)) + len(model.tokenize(SUFFIX)) + MAX_TOKENS
+    return N_CTX - overhead - 8  # margin for tokens merging at the joins
+
+def summarize_text_stream(text: str):
+    """
+    Summarizes text of any length, yielding the summary as it is generated.
+    Transcripts longer than the context window are split into token chunks that
+    are summarized separately (map), and the chunk summaries are combined until
+    they fit in one prompt (reduce); only that last completion is streamed.
+    """
+    start = time.perf_counter()
+    first, generated, started = None, 0, False
+    with get_pool().model() as model:
+        tokens = model.tokenize(text)
+        prefix = SUMMARY_PREFIX
+        while len(tokens) > _budget(model, prefix):
+            budget = _budget(model, prefix)
+            partial = [
+                model.complete(prefix, tokens[i:i + budget])
+                for i in range(0, len(tokens), budget)
+            ]
+            combined = model.tokenize("\n".join(f"- {s}" for s in partial if s))
+            if len(combined) >= len(tokens):  # summaries no shorter than their input
+                combined = combined[:_budget(model, COMBINE_PREFIX)]
+            tokens, prefix = combined, COMBINE_PREFIX
+
+        for piece in model.complete_stream(prefix, tokens):
+            if first is None:
+                first = time.perf_counter()
+            generated += 1
+            if not started:
+                piece = piece.lstrip()
+                started = bool(piece)
+            if piece:
+                yield piece
+
+    if first is not None:
+        rate = generated / max(time.perf_counter() - first, 1e-6)
+        print(f"[✓] Summary generated: first token after {first - start:.2f}s, "
+              f"{generated} tokens at {rate:.1f} tokens/s")
+
+def summarize_text(text: str) -> str:
+    return "".join(summarize_text_stream(text)).strip()
+
+def summarize_stream(transcript_path: str, summary_path: str):
+    """
+    Summarizes the meeting transcript with the pooled orca-mini model, yielding
+    the summary as it is generated. summary_path is written once it is complete.
+    """
+    try:
+    # Read transcript text
+        text = open(transcript_path, encoding="utf-8").read()
+
+        start = time.perf_counter()
+        pieces = []
+        for piece in summarize_text_stream(text):
+            pieces.append(piece)
+            yield piece
+        summary = "".join(pieces).strip()
+
         # Ensure output directory exists
         os.makedirs(os.path.dirname(summary_path), exist_ok=True)
-    
+
         # Write summary to file
         with open(summary_path, "w", encoding="utf-8") as f:
             f.write(summary)
-    
-        print(f"[✓] Summary saved to {summary_path}")
+
+        print(f"[✓] Summary saved to {summary_path} ({time.perf_counter() - start:.1f}s)")
     except FileNotFoundError:
         raise RuntimeError("Transcript file not found.")
     except Exception as e:
         raise RuntimeError(f"Summarization failed: {e}")
+
+def summarize(transcript_path: str, summary_path: str):
+    """
+    Summarizes the meeting transcript with the pooled orca-mini model.
+    """
+    for _ in summarize_stream(transcript_path, summary_path):
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize a transcript with the GGUF model")
+    parser.add_argument("transcript")
+    parser.add_argument("summary")
+    parser.add_argument("--threads", type=int, default=N_THREADS, help="n_threads (LLAMA_THREADS)")
+    parser.add_argument("--batch", type=int, default=N_BATCH, help="n_batch (LLAMA_BATCH)")
+    args = parser.parse_args()
+    N_THREADS, N_BATCH = args.threads, args.batch
+    summarize(args.transcript, args.summary)
+    print(pool_stats())
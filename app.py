@@ -1,9 +1,8 @@
 import sys
 sys.dont_write_bytecode = True 
-import os
-import sys
 import shutil
 import subprocess
+import threading
 import webbrowser
 from datetime import date
 from pathlib import Path
@@ -13,7 +12,8 @@ from tkinter import ttk, filedialog, scrolledtext, messagebox
 # Your existing imports
 from modules.transcribe import transcribe
 from modules.summarize import summarize
-from modules.search import query_faiss, build_faiss_index
+from modules.search import query_faiss, update_faiss_index
+from modules.query_parser import parse_query
 
 class MeetingAssistant(tk.Tk):
     def __init__(self):
@@ -82,16 +82,34 @@ class MeetingAssistant(tk.Tk):
             filetypes=(("Media Files", "*.wav;*.mp3;*.mp4"),)
         )
         if path:
+            self.file_path = path
             self.title_entry.delete(0, tk.END)
             self.title_entry.insert(0, Path(path).stem)
 
     def process_file(self):
-        path = self.title_entry.get()
+        path = getattr(self, "file_path", None)
         if not path or not Path(path).exists():
             messagebox.showerror("Error", "Select a valid file first.")
             return
-
-        # ... (rest of your existing process_file logic, replacing `window['-LOG-'].print` with `self.log()`)
+        title = self.title_entry.get().strip() or Path(path).stem
+        # Off the Tk thread; files processed together share summarization batches
+        threading.Thread(target=self._process, args=(Path(path), title), daemon=True).start()
+
+    def _process(self, media: Path, title: str):
+        log = lambda message: self.after(0, self.log, message)
+        today = date.today()
+        base = Path("meetings") / str(today.year) / f"{today:%m}" / f"{today:%d}-{title.replace(' ', '_')}"
+        base.mkdir(parents=True, exist_ok=True)
+        try:
+            log(f"Processing {media.name}...")
+            shutil.copy(media, base / f"{media.stem}.raw")
+            transcribe(str(media), str(base / "transcript.txt"))
+            log(f"Transcribed {media.name}, summarizing...")
+            summarize(str(base / "transcript.txt"), str(base / "summary.txt"))
+            update_faiss_index()
+            log(f"Done: {base}")
+        except Exception as e:
+            log(f"Error processing {media.name}: {e}")
 
     def search(self):
         query = self.search_entry.get().strip()
@@ -99,8 +117,27 @@ class MeetingAssistant(tk.Tk):
             messagebox.showinfo("Info", "Enter a search query.")
             return
         self.log(f"Searching for '{query}'...")
-        results = query_faiss(query, k=5)
-        # ... (update results area)
+        threading.Thread(target=self._search, args=(query,), daemon=True).start()
+
+    def _search(self, query: str):
+        try:
+            # Dates in the query ("last month") restrict the search to those meetings
+            results = query_faiss(query, k=5, date_ranges=parse_query(query)["date_ranges"])
+        except Exception as e:
+            self.after(0, self.log, f"Search error: {e}")
+            return
+        self.after(0, self.show_results, results)
+
+    def show_results(self, results: list[dict]):
+        text = "\n\n".join(
+            f"📅 {r['date']} - {r['slug'].replace('-', ' ').title()}\n{r['content'][:300].strip()}"
+            + (f"\n💬 \"{r['passage']['text'][:300].strip()}\"" if r.get("passage") else "")
+            for r in results
+        )
+        self.result_area.config(state="normal")
+        self.result_area.delete("1.0", tk.END)
+        self.result_area.insert(tk.END, text or "No past meetings matched.")
+        self.result_area.config(state="disabled")
 
 if __name__ == "__main__":
     app = MeetingAssistant()
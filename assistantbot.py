@@ -1,15 +1,25 @@
 import os
+import json
+import time
+import asyncio
+import tempfile
 from dotenv import load_dotenv
 from telegram import Update
 from telegram.constants import ChatAction
+from telegram.error import TelegramError
 from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
-from modules.transcribe import transcribe
-from modules.summarize import summarize
-from modules.search import query_faiss
+from modules.transcribe import transcribe_stream, clip_audio
+from modules.segments import format_time
+from modules.summarize import summarize, summary_stats
+from modules.search import (QueryBatcher, index_stats, embedding_cache_stats, query_cache_stats,
+                            SEARCH_MODES, SEARCH_MODE)
+from modules.query_parser import parse_query
+from modules.ingest import (media_hash, meeting_folder, normalized_audio, release_audio, existing_meeting,
+                            restore, remember)
 from datetime import date
 from pathlib import Path
 import logging
-from modules.search import build_faiss_index
+from modules.search import update_faiss_index
 
 logging.basicConfig(level=logging.INFO)
 
@@ -21,6 +31,16 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 if not TELEGRAM_BOT_TOKEN:
     raise ValueError("TELEGRAM_BOT_TOKEN is not set in the environment variables.")
 
+# Telegram rate-limits message edits (about one per second per chat, less in groups)
+PROGRESS_EDIT_SECONDS = 3.0
+PROGRESS_TEXT_CHARS = 300  # tail of the transcript shown in the progress message
+CLIP_PADDING_MS = 2000  # audio kept before and after a matched passage
+CLIP_MAX_MS = 5 * 60 * 1000
+# In a meeting folder while its recording is being processed (chat, file, media hash)
+PENDING_FILE = "pending.json"
+# Media hashes of recordings being processed (updates are handled concurrently)
+active_recordings = set()
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     /start command handler: greet the user.
@@ -45,10 +65,167 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "   Example: 'What was decided about marketing last month?'\n\n"
         "⚙️ Technical notes:\n"
         "   - Supports MP3, WAV, MP4 files\n"
-        "   - Processing takes 1-3 minutes depending on length"
+        "   - Processing takes 1-3 minutes depending on length\n"
+        "   - /stats shows search index load time and query counts\n"
+        "   - /mode hybrid|vector|lexical switches how searches match (lexical is best for names and ticket numbers)\n"
+        "   - /clip N sends the audio around a ⏱ timestamped search hit"
     )
     await update.message.reply_text(help_text, parse_mode="Markdown")
 
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /stats command handler: report the resident search index generations.
+    """
+    stats = index_stats()
+    if not stats["generations"]:
+        await update.message.reply_text("Search index not loaded yet.")
+        return
+    lines = [
+        f"{'▶' if g['generation'] == stats['current'] else '•'} generation {g['generation']}: "
+        f"{g['vectors']} meetings in {g['shards']} shards ({g['shards_loaded']} loaded), "
+        f"loaded {g['loaded_at']} in {g['load_seconds']:.3f}s, "
+        f"{g['queries']} queries"
+        for g in stats["generations"]
+    ]
+    cache = embedding_cache_stats()
+    lines.append(
+        f"Embedding cache: {cache['entries']} entries, {cache['hits']} hits, "
+        f"{cache['misses']} misses ({cache['hit_rate']:.0%} hit rate)"
+    )
+    queries = query_cache_stats()
+    lines.append(
+        f"Query cache: {queries['entries']} entries, {queries['hits']} hits, {queries['misses']} misses"
+    )
+    summaries = summary_stats()
+    lines.append(
+        f"Summarizer: {summaries['queue_depth']} chunks queued (max {summaries['max_queue_depth']}), "
+        f"{summaries['chunks']} chunks in {summaries['batches']} batches, "
+        f"batch sizes {summaries['batch_sizes'] or '-'}, "
+        f"cache {summaries['cache_hits']} hits / {summaries['cache_misses']} misses"
+    )
+    await update.message.reply_text("\n".join(lines))
+
+async def mode_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /mode command handler: choose lexical, vector or hybrid search for this chat.
+    """
+    if context.args and context.args[0].lower() in SEARCH_MODES:
+        context.chat_data["search_mode"] = context.args[0].lower()
+    current = context.chat_data.get("search_mode", SEARCH_MODE)
+    await update.message.reply_text(
+        f"🔍 Search mode: {current} (options: {', '.join(SEARCH_MODES)})"
+    )
+
+async def transcribe_with_progress(message, raw_dst: Path, txt_dst: Path, digest: str = None):
+    """
+    Transcribe raw_dst into txt_dst, editing `message` with the percentage done
+    and the latest transcribed text (at most every PROGRESS_EDIT_SECONDS).
+    """
+    loop = asyncio.get_running_loop()
+    stream = transcribe_stream(str(raw_dst), str(txt_dst), digest=digest)
+    latest, shown, last_edit = "", message.text, 0.0
+    while True:
+        # Whisper runs in a worker thread; the event loop keeps serving other chats
+        event = await loop.run_in_executor(None, next, stream, None)
+        if event is None:
+            break
+        new_text = " ".join(seg["text"].strip() for seg in event["segments"])
+        latest = f"{latest} {new_text}".strip()
+        if time.monotonic() - last_edit < PROGRESS_EDIT_SECONDS:
+            continue
+        percent = f" {event['progress']:.0%}" if event["progress"] is not None else ""
+        tail = latest if len(latest) <= PROGRESS_TEXT_CHARS else "…" + latest[-PROGRESS_TEXT_CHARS:]
+        text = f"📝 Transcribing...{percent}\n\n{tail}"
+        if text != shown:
+            try:
+                await message.edit_text(text)
+                shown = text
+            except TelegramError as e:  # rate limited or message gone; the next edit catches up
+                logging.debug(f"Progress edit failed: {e}")
+            last_edit = time.monotonic()
+    try:
+        await message.edit_text("📝 Transcription complete.")
+    except TelegramError as e:
+        logging.debug(f"Progress edit failed: {e}")
+
+def mark_pending(base: Path, **stages):
+    """Record finished stages in the meeting's pending file, so a restart skips them"""
+    pending = base / PENDING_FILE
+    job = json.loads(pending.read_text(encoding="utf-8"))
+    job.update(stages)
+    tmp = pending.with_name(PENDING_FILE + ".tmp")
+    tmp.write_text(json.dumps(job), encoding="utf-8")
+    os.replace(tmp, pending)
+
+async def process_recording(bot, chat_id: int, base: Path, raw_dst: Path, digest: str):
+    """
+    Transcribe, summarize and index a recording stored in its meeting folder,
+    reporting progress to the chat. Finished stages are recorded in the pending
+    file and long transcriptions checkpoint per chunk, so running this again
+    after a crash only redoes what was lost.
+    """
+    txt_dst = base / "transcript.txt"
+    summ_dst = base / "summary.txt"
+    pending = base / PENDING_FILE
+    job = json.loads(pending.read_text(encoding="utf-8")) if pending.exists() else {}
+
+    if job.get("transcribed") and txt_dst.exists():
+        await bot.send_message(chat_id, "📝 Transcript already complete.")
+    else:
+        # Transcribe the file
+        progress_message = await bot.send_message(chat_id, "📝 Transcribing the file...")
+        # Converted to 16 kHz mono WAV once; cached by content hash with the results.
+        # The folder holds its own link to the WAV until transcription is done.
+        audio = await asyncio.to_thread(normalized_audio, raw_dst, digest, base)
+        await transcribe_with_progress(progress_message, audio, txt_dst, digest)
+        release_audio(base)
+        if pending.exists():
+            mark_pending(base, transcribed=True)
+
+    if not (job.get("summarized") and summ_dst.exists()):
+        await bot.send_message(chat_id, "📄 Summarizing the transcript...")
+        # Summarize the transcript; handlers run concurrently, so chunks of uploads
+        # processed at the same time share the summary worker's batches
+        await asyncio.to_thread(summarize, str(txt_dst), str(summ_dst))
+        remember(digest, base)
+        if pending.exists():
+            mark_pending(base, summarized=True)
+
+    # Notify the user of success
+    await bot.send_message(chat_id, "✅ Processing complete! The transcript and summary have been saved.")
+    # Off the event loop: other chats keep being served during a shard rebuild
+    # (updates from concurrent uploads queue on the index writer lock)
+    await asyncio.to_thread(update_faiss_index)
+    pending.unlink(missing_ok=True)
+    await bot.send_message(chat_id, "🔍 Search index updated.")
+
+async def resume_pending(application):
+    """
+    On startup, finish recordings whose processing was cut short by a restart.
+    """
+    for pending in sorted(Path("meetings").glob(f"*/*/*/{PENDING_FILE}")):
+        base = pending.parent
+        job = json.loads(pending.read_text(encoding="utf-8"))
+        raw_dst = base / job["raw"]
+        if not raw_dst.exists():
+            pending.unlink()
+            continue
+        if job["digest"] in active_recordings:  # sent again since the restart
+            continue
+        logging.info(f"Resuming processing of {base}")
+        active_recordings.add(job["digest"])
+        try:
+            await application.bot.send_message(job["chat_id"], f"🔁 Resuming {base.name} after a restart...")
+            await process_recording(application.bot, job["chat_id"], base, raw_dst, job["digest"])
+        except Exception as e:
+            logging.error(f"Resuming {base} failed: {e}")
+        finally:
+            active_recordings.discard(job["digest"])
+
+async def start_resuming(application):
+    # In the background: polling starts right away and new uploads aren't held up
+    application.create_task(resume_pending(application))
+
 async def handle_media(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handler for incoming audio or video files:
@@ -90,71 +267,109 @@ async def handle_media(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("📥 File received. Processing...")
 
 
+        # A re-sent or forwarded recording resolves to the meeting made from it before
+        digest = await asyncio.to_thread(media_hash, Path(temp_filename))
+        existing = existing_meeting(digest)
+        if existing is not None or digest in active_recordings:
+            os.remove(temp_filename)
+            if existing is None:
+                await update.message.reply_text("⏳ This recording is already being processed.")
+                return
+            summary = (existing / "summary.txt").read_text(encoding="utf-8")
+            await update.message.reply_text(
+                f"♻️ This recording was already processed as {existing.as_posix()}.\n\n📝 {summary[:1000]}"
+            )
+            return
+
         # Compute storage paths
-        # Replace in handle_media():
         slug = caption_title or file_name or "untitled"
         slug = Path(slug).stem  # Remove file extension
         slug = slug.replace(" ", "_").strip()  # Force underscores and trim
         today = date.today()
-        # In handle_media():
-        base = Path("meetings") / str(today.year) / f"{today:%m}" / f"{today:%d}-{slug}"
-        base.mkdir(parents=True, exist_ok=True)  # This creates nested folders
-        raw_dst = base / f"{slug}.raw"
-        txt_dst = base / "transcript.txt"
-        summ_dst = base / "summary.txt"
-
-        # Debugging logs for paths
-        logging.debug(f"Base directory: {base}")
-        logging.debug(f"Raw file path: {raw_dst}")
-        logging.debug(f"Transcript path: {txt_dst}")
-        logging.debug(f"Summary path: {summ_dst}")
-
-        # Ensure the base directory exists
-        os.makedirs(base, exist_ok=True)
-        logging.debug(f"Directory created successfully: {base}")
-
-        # Check if the destination file exists
-        if os.path.exists(raw_dst):
-            os.remove(raw_dst)  # Delete the existing file
-
-        # Rename the file
-        os.rename(temp_filename, raw_dst)
-
-        # Transcribe the file
-        await update.message.reply_text("📝 Transcribing the file...")
+        # Uploads are handled concurrently: each recording claims its own folder
+        # (DD-slug, or DD-slug-<hash> when another recording already has that name)
+        active_recordings.add(digest)
         try:
-            transcribe(str(raw_dst), str(txt_dst))
-            await update.message.reply_text("📄 Summarizing the transcript...")
-
-            # Summarize the transcript
-            summarize(str(txt_dst), str(summ_dst))
-
-            # Notify the user of success
-            await update.message.reply_text(
-                "✅ Processing complete! The transcript and summary have been saved."
+            base = await asyncio.to_thread(
+                meeting_folder, Path("meetings") / str(today.year) / f"{today:%m}", f"{today:%d}-{slug}", digest
             )
-            build_faiss_index() 
-            await update.message.reply_text("🔍 Search index updated.")
+            raw_dst = base / f"{slug}.raw"
+            logging.debug(f"Meeting folder: {base}")
+            os.replace(temp_filename, raw_dst)
 
-        except Exception as e:
-            logging.error(f"Error during processing: {e}")
-            await update.message.reply_text(f"❗ An error occurred: {e}")
+            if restore(digest, base):
+                await update.message.reply_text("♻️ Reused the transcript and summary of an earlier copy of this recording.")
+                await asyncio.to_thread(update_faiss_index)
+                await update.message.reply_text("🔍 Search index updated.")
+                return
+
+            # Recorded before any work starts, so a restarted bot can finish the job
+            (base / PENDING_FILE).write_text(json.dumps({
+                "chat_id": update.effective_chat.id, "raw": raw_dst.name, "digest": digest,
+            }), encoding="utf-8")
+            try:
+                await process_recording(context.bot, update.effective_chat.id, base, raw_dst, digest)
+            except Exception as e:
+                logging.error(f"Error during processing: {e}")
+                await update.message.reply_text(f"❗ An error occurred: {e}")
+        finally:
+            active_recordings.discard(digest)
     except Exception as e:
         logging.error(f"Error handling media: {e}")
         await update.message.reply_text(f"❗ An error occurred while processing the file: {e}")
 
         
+query_batcher = QueryBatcher()
+
+async def clip_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /clip N command handler: send the audio around the Nth timestamped hit of the last search.
+    """
+    clips = context.chat_data.get("clips", {})
+    if not context.args or context.args[0] not in clips:
+        await update.message.reply_text("Search first, then use /clip N with a number shown next to a ⏱ result.")
+        return
+    summary_path, start_ms, end_ms = clips[context.args[0]]
+    raw = next(Path(summary_path).parent.glob("*.raw"), None)
+    if raw is None:
+        await update.message.reply_text("❗ The original recording of this meeting is not stored.")
+        return
+    start_ms = max(start_ms - CLIP_PADDING_MS, 0)
+    end_ms = min(end_ms + CLIP_PADDING_MS, start_ms + CLIP_MAX_MS)
+    try:
+        with tempfile.TemporaryDirectory(prefix="clip-") as tmp:
+            clip = await asyncio.to_thread(clip_audio, raw, start_ms, end_ms, Path(tmp) / "clip.ogg")
+            with open(clip, "rb") as f:
+                await update.message.reply_voice(f, caption=f"⏱ {format_time(start_ms)}–{format_time(end_ms)}")
+    except Exception as e:
+        logging.error(f"Clip failed: {e}")
+        await update.message.reply_text(f"❗ Could not cut the clip: {e}")
+
 async def handle_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip()
     if text.startswith('/'):
         return
     try:
-        results = query_faiss(text, k=5)
+        # Dates in the query ("last month") restrict the search to those meetings;
+        # spaCy runs in a worker thread so other updates aren't held up meanwhile
+        date_ranges = (await asyncio.to_thread(parse_query, text))["date_ranges"]
+        mode = context.chat_data.get("search_mode", SEARCH_MODE)
+        # Messages arriving together are searched as one batch
+        results = await query_batcher.search(text, k=5, date_ranges=date_ranges, mode=mode)
         if results:
+            # Passages with timestamps can be played back with /clip N
+            clips = {}
+            for r in results:
+                if "start_ms" in r.get("passage", {}):
+                    clips[str(len(clips) + 1)] = (r["path"], r["passage"]["start_ms"], r["passage"]["end_ms"])
+                    r["clip"] = len(clips)
+            context.chat_data["clips"] = clips
             # Use correct metadata fields from search.py
             reply = "\n\n".join(
                 f"📅 {r['date']} - {r['slug'].replace('-', ' ').title()}\n"
                 f"📝 {r['content'][:300].strip().replace(chr(10), ' ')}..."  # chr(10) is \n
+                + (f"\n💬 \"{r['passage']['text'][:300].replace(chr(10), ' ')}...\"" if r.get("passage") else "")
+                + (f"\n⏱ at {format_time(r['passage']['start_ms'])} (/clip {r['clip']})" if "clip" in r else "")
                 for r in results
             )
         else:
@@ -168,13 +383,19 @@ async def handle_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❗ Search failed. Please try again.")
 
 # Initialize the bot application
-application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+# Updates are handled concurrently, so searches arriving together reach the QueryBatcher together
+application = (
+    ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).concurrent_updates(True).post_init(start_resuming).build()
+)
 
 application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_query))        
 
 # Add command handlers
 application.add_handler(CommandHandler("start", start))
 application.add_handler(CommandHandler("help", help_command))
+application.add_handler(CommandHandler("stats", stats_command))
+application.add_handler(CommandHandler("mode", mode_command))
+application.add_handler(CommandHandler("clip", clip_command))
 
 # Add media handler
 media_filter = filters.AUDIO | filters.VOICE | filters.VIDEO
@@ -0,0 +1,176 @@
+# benchmarks/bench_search.py
+"""Indexing and search benchmarks on a synthetic meeting archive.
+
+    python -m benchmarks.bench_search --sizes 1000 10000 --out bench.json
+    python -m benchmarks.bench_search --compare before.json after.json
+
+Each size runs in its own subprocess (so peak RSS is per size) inside a
+temporary directory, with the offline hashing embedder unless --embedder
+sentence-transformers is given. Results are written as JSON tagged with the
+git commit, so runs can be compared across commits.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+
+from benchmarks import corpus
+from modules import search
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_SIZES = (1000, 10000)  # 100000 works too, but takes a while with transcripts
+ADD_MEETINGS = 20  # meetings added for the incremental update measurement
+QUERIES = 200
+MODES = ("vector", "lexical", "hybrid")
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process in bytes (0 where it can't be read)"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS reports bytes, Linux KiB
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+def _percentiles(samples: list[float]) -> dict:
+    ms = np.array(samples) * 1000
+    return {f"p{q}_ms": round(float(np.percentile(ms, q)), 3) for q in (50, 95, 99)}
+
+def run_one(n: int, workdir: Path, transcript_words: int) -> dict:
+    """Generate n meetings in workdir, then build, update and query the index there"""
+    os.chdir(workdir)
+    result = {"meetings": n}
+
+    start = time.perf_counter()
+    corpus.generate(search.MEETINGS_DIR, n, transcript_words=transcript_words)
+    result["generate_seconds"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    search.build_faiss_index()
+    result["build_seconds"] = round(time.perf_counter() - start, 3)
+
+    corpus.add_meetings(search.MEETINGS_DIR, n, ADD_MEETINGS, transcript_words=transcript_words)
+    start = time.perf_counter()
+    search.update_faiss_index()
+    result["incremental_add_seconds"] = round(time.perf_counter() - start, 3)
+    result["incremental_add_meetings"] = ADD_MEETINGS
+
+    queries = corpus.sample_queries(QUERIES)
+    start = time.perf_counter()
+    search.query_faiss(queries[0], k=5)
+    result["cold_query_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    for mode in MODES:
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            search.query_faiss(query, k=5, mode=mode)
+            timings.append(time.perf_counter() - start)
+        result[f"query_{mode}"] = _percentiles(timings)
+
+    start = time.perf_counter()
+    search.query_faiss_batch(queries, k=5)
+    result["batch_query_ms_per_query"] = round((time.perf_counter() - start) * 1000 / len(queries), 3)
+
+    result["peak_rss_bytes"] = _peak_rss()
+    cache = _dir_size(search.INDEX_DIR / "embeddings")
+    result["index_bytes"] = _dir_size(search.INDEX_DIR) - cache
+    result["embedding_cache_bytes"] = cache
+    return result
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run(sizes, embedder: str, transcript_words: int) -> dict:
+    """Benchmark each size in a fresh subprocess and working directory"""
+    env = dict(os.environ, EMBED_BACKEND=embedder)
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory(prefix="bench-search-") as workdir:
+            out = Path(workdir) / "result.json"
+            print(f"Benchmarking {n} meetings...")
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_search", "--run-one", str(n),
+                 "--workdir", workdir, "--result", str(out), "--transcript-words", str(transcript_words)],
+                cwd=REPO_ROOT, env=env, check=True, stdout=subprocess.DEVNULL,
+            )
+            results.append(json.loads(out.read_text(encoding="utf-8")))
+            print(json.dumps(results[-1], indent=1))
+    return {
+        "commit": _commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "embedder": embedder,
+        "transcript_words": transcript_words,
+        "results": results,
+    }
+
+def _flatten(result: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def compare(before_path: Path, after_path: Path):
+    """Print every metric of two result files side by side, per corpus size"""
+    before = json.loads(Path(before_path).read_text(encoding="utf-8"))
+    after = json.loads(Path(after_path).read_text(encoding="utf-8"))
+    print(f"{before['commit']} -> {after['commit']}")
+    previous = {r["meetings"]: _flatten(r) for r in before["results"]}
+    for result in after["results"]:
+        old = previous.get(result["meetings"])
+        if old is None:
+            continue
+        print(f"\n{result['meetings']} meetings")
+        for key, value in _flatten(result).items():
+            if key == "meetings" or key not in old:
+                continue
+            change = f"{(value - old[key]) / old[key]:+.1%}" if old[key] else ""
+            print(f"  {key:<36} {old[key]:>14} {value:>14} {change:>8}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark index builds and searches on a synthetic archive")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="numbers of meetings to generate")
+    parser.add_argument("--embedder", choices=("hashing", "sentence-transformers"), default="hashing",
+                        help="hashing runs offline without downloading a model")
+    parser.add_argument("--transcript-words", type=int, default=400, help="words per synthetic transcript")
+    parser.add_argument("--out", type=Path, default=Path("bench_results.json"), help="where to write results")
+    parser.add_argument("--compare", type=Path, nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--result", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.run_one:
+        result = run_one(args.run_one, args.workdir, args.transcript_words)
+        args.result.write_text(json.dumps(result, indent=1), encoding="utf-8")
+    else:
+        report = run(args.sizes, args.embedder, args.transcript_words)
+        args.out.write_text(json.dumps(report, indent=1), encoding="utf-8")
+        print(f"Results written to {args.out}")
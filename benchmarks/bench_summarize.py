@@ -0,0 +1,171 @@
+# benchmarks/bench_summarize.py
+"""Summarization backend benchmark: latency, throughput, memory and ROUGE.
+
+    python -m benchmarks.bench_summarize --backends pytorch onnx --out bench_summarize.json
+
+Each backend runs in its own subprocess (so load time and peak RSS are its
+own) over the same fixed transcript set, by default every transcript.txt under
+meetings/. Summaries of every backend are scored with ROUGE-1/2/L against the
+first backend's (the current pipeline), and against the summary.txt saved next
+to each transcript where there is one. The summary cache is disabled.
+"""
+import os
+import re
+import sys
+import json
+import time
+import platform
+import subprocess
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKENDS = ("pytorch", "onnx")
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process in bytes (0 where it can't be read)"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS reports bytes, Linux KiB
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+def _f1(overlap: int, hyp: int, ref: int) -> float:
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / hyp, overlap / ref
+    return 2 * precision * recall / (precision + recall)
+
+def rouge_n(reference: str, hypothesis: str, n: int) -> float:
+    ngrams = lambda words: Counter(tuple(words[i:i + n]) for i in range(len(words) - n + 1))
+    ref, hyp = ngrams(_tokens(reference)), ngrams(_tokens(hypothesis))
+    return _f1(sum((ref & hyp).values()), sum(hyp.values()), sum(ref.values()))
+
+def rouge_l(reference: str, hypothesis: str) -> float:
+    ref, hyp = _tokens(reference), _tokens(hypothesis)
+    previous = [0] * (len(hyp) + 1)
+    for word in ref:  # longest common subsequence, one row at a time
+        current = [0]
+        for j, other in enumerate(hyp):
+            current.append(previous[j] + 1 if word == other else max(previous[j + 1], current[j]))
+        previous = current
+    return _f1(previous[-1], len(hyp), len(ref))
+
+def rouge(references: list[str], hypotheses: list[str]) -> dict:
+    """Mean ROUGE-1/2/L F1 over pairs"""
+    pairs = list(zip(references, hypotheses))
+    return {
+        "rouge1": round(float(np.mean([rouge_n(r, h, 1) for r, h in pairs])), 4),
+        "rouge2": round(float(np.mean([rouge_n(r, h, 2) for r, h in pairs])), 4),
+        "rougeL": round(float(np.mean([rouge_l(r, h) for r, h in pairs])), 4),
+    }
+
+def run_one(transcripts: list[Path]) -> dict:
+    """Load the SUMMARY_BACKEND pipeline, then time sequential and concurrent summarization"""
+    start = time.perf_counter()
+    from modules import summarize
+    from modules.disk_cache import DiskCache
+    result = {"backend": summarize.SUMMARY_BACKEND, "load_seconds": round(time.perf_counter() - start, 3)}
+    texts = [path.read_text(encoding="utf-8") for path in transcripts]
+
+    def uncached():
+        # A fresh, unbounded cache per pass: nothing is ever reused between runs
+        summarize.summary_cache = DiskCache(Path(tempfile.mkdtemp(prefix="bench-summaries-")), 0)
+
+    # Sequential: one transcript at a time, as a single upload sees it
+    uncached()
+    summaries, timings = [], []
+    for text in texts:
+        start = time.perf_counter()
+        summaries.append(summarize.summarize_text(text))
+        timings.append(time.perf_counter() - start)
+    ms = np.array(timings) * 1000
+    result["latency"] = {f"p{q}_ms": round(float(np.percentile(ms, q)), 1) for q in (50, 95)}
+    result["latency"]["mean_ms"] = round(float(ms.mean()), 1)
+
+    # Concurrent: every transcript at once, sharing the worker's batches
+    uncached()
+    summarize.summary_worker.batch_sizes.clear()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=summarize.summarize_text, args=(text,)) for text in texts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    result["throughput_transcripts_per_s"] = round(len(texts) / elapsed, 3)
+    result["worker"] = summarize.summary_stats()
+    result["peak_rss_bytes"] = _peak_rss()
+    result["summaries"] = summaries
+    return result
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run(backends, transcripts: list[Path]) -> dict:
+    """Benchmark each backend in a fresh subprocess and score its summaries"""
+    results = []
+    for backend in backends:
+        with tempfile.TemporaryDirectory(prefix="bench-summarize-") as workdir:
+            out = Path(workdir) / "result.json"
+            print(f"Benchmarking the {backend} backend on {len(transcripts)} transcripts...")
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_summarize", "--run-one", "--result", str(out),
+                 "--transcripts", *map(str, transcripts)],
+                cwd=REPO_ROOT, env=dict(os.environ, SUMMARY_BACKEND=backend), check=True,
+            )
+            results.append(json.loads(out.read_text(encoding="utf-8")))
+
+    reference = results[0]["summaries"]
+    saved = {i: path.with_name("summary.txt").read_text(encoding="utf-8")
+             for i, path in enumerate(transcripts) if path.with_name("summary.txt").exists()}
+    for result in results:
+        result[f"rouge_vs_{results[0]['backend']}"] = rouge(reference, result["summaries"])
+        if saved:
+            result["rouge_vs_saved"] = rouge(list(saved.values()), [result["summaries"][i] for i in saved])
+        print(json.dumps({k: v for k, v in result.items() if k != "summaries"}, indent=1))
+    return {
+        "commit": _commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "transcripts": [str(path) for path in transcripts],
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare summarization backends on a fixed transcript set")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS),
+                        help="the first one is the ROUGE reference")
+    parser.add_argument("--transcripts", type=Path, nargs="+",
+                        help="transcript files (default: every meetings/**/transcript.txt)")
+    parser.add_argument("--out", type=Path, default=Path("bench_summarize.json"), help="where to write results")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    transcripts = args.transcripts or sorted((REPO_ROOT / "meetings").rglob("transcript.txt"))
+    if args.run_one:
+        args.result.write_text(json.dumps(run_one(transcripts), indent=1), encoding="utf-8")
+    else:
+        report = run(args.backends, transcripts)
+        args.out.write_text(json.dumps(report, indent=1), encoding="utf-8")
+        print(f"Results written to {args.out}")
@@ -0,0 +1,75 @@
+# benchmarks/corpus.py
+from datetime import date, timedelta
+from pathlib import Path
+import numpy as np
+
+VOCABULARY_SIZE = 5000
+SYLLABLES = ("ka", "lo", "mi", "ren", "to", "sa", "vel", "dor", "an", "qui", "ber", "nu", "pra", "ex", "sol")
+TOPICS = ("standup", "planning", "retro", "design-review", "customer-call", "one-on-one", "budget", "incident")
+SPEAKERS = 6
+START_DATE = date(2021, 1, 1)
+SPAN_DAYS = 3 * 365  # the archive covers three years, like a real one that grew over time
+
+def _vocabulary(size: int = VOCABULARY_SIZE) -> np.ndarray:
+    """Deterministic made-up words, so the corpus is the same on every machine"""
+    rng = np.random.default_rng(12345)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES, size=rng.integers(2, 5))))
+    return np.array(sorted(words))
+
+_WORDS = _vocabulary()
+# Zipf-like frequencies: a few very common words, a long tail of rare ones
+_WEIGHTS = 1.0 / np.arange(1, len(_WORDS) + 1)
+_WEIGHTS /= _WEIGHTS.sum()
+
+def _text(rng, words: int) -> list[str]:
+    return list(rng.choice(_WORDS, size=words, p=_WEIGHTS))
+
+def _write_meeting(root: Path, number: int, day: date, rng, summary_words: int, transcript_words: int) -> Path:
+    topic = TOPICS[number % len(TOPICS)]
+    folder = Path(root) / f"{day.year}" / f"{day.month:02d}" / f"{day.day:02d}-{topic}-{number:06d}"
+    folder.mkdir(parents=True, exist_ok=True)
+
+    # Ticket codes give the keyword index something exact to find
+    tickets = [f"proj-{n}" for n in rng.integers(1000, 9999, size=2)]
+    summary = _text(rng, summary_words) + tickets
+    rng.shuffle(summary)
+    (folder / "summary.txt").write_text(" ".join(summary), encoding="utf-8")
+
+    words = _text(rng, transcript_words) + tickets
+    lines = []
+    for start in range(0, len(words), 25):
+        lines.append(f"Speaker {rng.integers(1, SPEAKERS + 1)}: {' '.join(words[start:start + 25])}")
+    (folder / "transcript.txt").write_text("\n".join(lines), encoding="utf-8")
+    return folder / "summary.txt"
+
+def generate(root: Path, n: int, seed: int = 0, summary_words: int = 60,
+             transcript_words: int = 400) -> list[Path]:
+    """Write n meetings as root/YYYY/MM/DD-slug/{summary,transcript}.txt, spread
+    evenly over SPAN_DAYS from START_DATE. Returns the summary paths."""
+    rng = np.random.default_rng(seed)
+    return [
+        _write_meeting(root, i, START_DATE + timedelta(days=i * SPAN_DAYS // max(n, 1)), rng,
+                       summary_words, transcript_words)
+        for i in range(n)
+    ]
+
+def add_meetings(root: Path, first: int, n: int, seed: int = 1, summary_words: int = 60,
+                 transcript_words: int = 400) -> list[Path]:
+    """Write n more meetings numbered from `first`, dated on the archive's last day
+    (what a day of new uploads looks like)"""
+    rng = np.random.default_rng(seed)
+    day = START_DATE + timedelta(days=SPAN_DAYS)
+    return [_write_meeting(root, first + i, day, rng, summary_words, transcript_words) for i in range(n)]
+
+def sample_queries(n: int, seed: int = 2) -> list[str]:
+    """Short keyword queries drawn from the corpus vocabulary; every tenth is a ticket code"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for i in range(n):
+        if i % 10 == 9:
+            queries.append(f"proj-{rng.integers(1000, 9999)}")
+        else:
+            queries.append(" ".join(_text(rng, int(rng.integers(2, 5)))))
+    return queries
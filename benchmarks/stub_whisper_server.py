@@ -0,0 +1,83 @@
+# benchmarks/stub_whisper_server.py
+"""Stand-in for whisper.cpp's whisper-server, for testing without a model.
+
+    WHISPER_SERVER="python benchmarks/stub_whisper_server.py --delay 0.5" python assistantbot.py
+
+tests/test_whisper_server.py runs the server pool and chunked transcription
+against it.
+
+Takes the same command line as whisper-server (-m, --host, --port, -t,
+--convert), answers GET / once "loaded", and answers POST /inference with a
+verbose_json body: one fake segment per 5 seconds of 16 kHz mono WAV (or a
+single segment for anything else). Like the real server it handles one
+request at a time.
+"""
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+SEGMENT_SECONDS = 5.0
+WAV_BYTES_PER_SECOND = 32000  # 16 kHz, mono, 16-bit
+
+def _file_bytes(body: bytes) -> bytes:
+    """The uploaded file of a multipart/form-data body"""
+    match = re.search(rb'name="file"[^\r\n]*\r\n(?:[^\r\n]+\r\n)*\r\n', body)
+    if not match:
+        return b""
+    rest = body[match.end():]
+    return rest[:rest.rfind(b"\r\n--")]
+
+class Handler(BaseHTTPRequestHandler):
+    delay = 0.0
+
+    def _reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._reply(200, {"status": "ok"})
+
+    def do_POST(self):
+        if self.path != "/inference":
+            self._reply(404, {"error": "not found"})
+            return
+        audio = _file_bytes(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if not audio:
+            self._reply(400, {"error": "no 'file' field in the request"})
+            return
+        time.sleep(self.delay)
+        duration = max(len(audio) - 44, 0) / WAV_BYTES_PER_SECOND if audio[:4] == b"RIFF" else SEGMENT_SECONDS
+        segments, start = [], 0.0
+        while start < duration or not segments:
+            end = min(start + SEGMENT_SECONDS, max(duration, SEGMENT_SECONDS))
+            segments.append({"id": len(segments), "start": start, "end": end,
+                             "text": f" stub segment {len(segments) + 1}"})
+            start = end
+        self._reply(200, {"task": "transcribe", "language": "en", "duration": duration,
+                          "text": "".join(seg["text"] for seg in segments), "segments": segments})
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fake whisper-server for tests")
+    parser.add_argument("-m", "--model", default="stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-t", "--threads", type=int, default=4)
+    parser.add_argument("--convert", action="store_true")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds spent per request")
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="simulated model load time")
+    args = parser.parse_args()
+
+    time.sleep(args.load_seconds)
+    Handler.delay = args.delay
+    HTTPServer((args.host, args.port), Handler).serve_forever()
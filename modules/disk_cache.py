@@ -0,0 +1,194 @@
+# modules/disk_cache.py
+import os
+import json
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+CACHE_DIR = Path("cache")
+# Other processes share the cache; the running size total is re-read from disk this often
+RESCAN_SECONDS = 60.0
+# Eviction trims to this fraction of max_bytes, so a full cache isn't rescanned on every write
+EVICT_TO = 0.9
+
+def hard_link(source: Path, target) -> bool:
+    """Replace `target` with a hard link to `source`; False if they can't be linked"""
+    tmp = f"{target}.link"
+    try:
+        if os.path.samefile(source, target):  # rename() between links of one file does nothing
+            return True
+    except OSError:
+        pass
+    try:
+        os.unlink(tmp)  # left by an interrupted call
+    except OSError:
+        pass
+    try:
+        os.link(source, tmp)
+    except OSError:  # other filesystem, or no hard links
+        return False
+    os.replace(tmp, target)
+    return True
+
+class DiskCache:
+    """Files cached on disk by key, evicting least-recently-used entries.
+
+    Each key is a directory root/<key[:2]>/<key>/ holding any number of named
+    files. Writes go through a temporary file and os.replace, so readers
+    (including other processes) never see a partial file; the directory's
+    mtime records the last use and drives eviction once the cache grows past
+    max_bytes. Writes keep a running size total, so the directory is only
+    scanned to evict, or every RESCAN_SECONDS to catch up with other processes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total = None  # bytes, as of the last scan plus writes since
+        self._scanned = 0.0
+        self._lock = threading.Lock()
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _touch(self, entry: Path):
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+    def get(self, key: str, name: str) -> Optional[Path]:
+        """Path of the cached file, or None"""
+        entry = self._entry(key)
+        path = entry / name
+        if not path.is_file():
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(entry)
+        return path
+
+    def get_text(self, key: str, name: str) -> Optional[str]:
+        path = self.get(key, name)
+        return path.read_text(encoding="utf-8") if path else None
+
+    def get_json(self, key: str, name: str):
+        text = self.get_text(key, name)
+        return json.loads(text) if text is not None else None
+
+    def put(self, key: str, name: str, source: Path, move: bool = False, link: bool = False) -> Path:
+        """Store a copy of `source` (or move it there, or hard-link it where the
+        filesystem allows) and return the cached path"""
+        entry = self._entry(key)
+        entry.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=entry, prefix=f".{name}.")
+        os.close(fd)
+        if move:
+            shutil.move(str(source), tmp)
+        elif link and hard_link(source, tmp):
+            pass
+        else:
+            shutil.copyfile(source, tmp)
+        self._replace(tmp, entry / name, key)
+        return entry / name
+
+    def put_text(self, key: str, name: str, text: str) -> Path:
+        entry = self._entry(key)
+        entry.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=entry, prefix=f".{name}.")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        self._replace(tmp, entry / name, key)
+        return entry / name
+
+    def put_json(self, key: str, name: str, data) -> Path:
+        return self.put_text(key, name, json.dumps(data, indent=1))
+
+    def path(self, key: str, name: str) -> Path:
+        """Where `name` of `key` lives, for writers that produce the file themselves
+        (write elsewhere and put(..., move=True) to keep the write atomic)"""
+        return self._entry(key) / name
+
+    def _replace(self, tmp: str, path: Path, key: str):
+        """Move a finished temporary file into place and account for its size"""
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        added = os.path.getsize(tmp)
+        os.replace(tmp, path)
+        self._touch(path.parent)
+        self._grew(added - replaced, keep=key)
+
+    def _grew(self, delta: int, keep: str = None):
+        """Update the running total and evict only once it is past max_bytes"""
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            if self._total is None or time.monotonic() - self._scanned > RESCAN_SECONDS:
+                self._total = sum(size for _, size, _ in self._entries())
+                self._scanned = time.monotonic()
+            else:
+                self._total += delta
+            if self._total <= self.max_bytes:
+                return
+        self.evict(keep, target=int(self.max_bytes * EVICT_TO))
+
+    def remove(self, key: str):
+        entry = self._entry(key)
+        try:
+            size = sum(p.stat().st_size for p in entry.iterdir() if p.is_file())
+        except OSError:
+            size = 0
+        shutil.rmtree(entry, ignore_errors=True)
+        with self._lock:
+            if self._total is not None:
+                self._total = max(self._total - size, 0)
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """(last use, size in bytes, directory) of every entry"""
+        entries = []
+        for entry in self.root.glob("*/*"):
+            try:
+                size = sum(p.stat().st_size for p in entry.iterdir() if p.is_file())
+                entries.append((entry.stat().st_mtime, size, entry))
+            except OSError:  # removed by another process meanwhile
+                continue
+        return entries
+
+    def evict(self, keep: str = None, target: int = None):
+        """Remove least recently used entries until the cache fits in max_bytes
+        (down to EVICT_TO of it when called because a write went over)"""
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            if target is None or total <= self.max_bytes:
+                target = self.max_bytes
+            for _, size, entry in entries:
+                if total <= target:
+                    break
+                if entry.name == keep:
+                    continue
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                self.evictions += 1
+            self._total, self._scanned = total, time.monotonic()
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
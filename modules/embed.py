@@ -1,9 +1,53 @@
 # modules/embed.py
-from sentence_transformers import SentenceTransformer
+import os
+import re
+import zlib
+import numpy as np
 
 # Use a small, fast model
 EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+# "sentence-transformers" (default) or "hashing": an offline, model-free embedder
+# for benchmarks and CI boxes without torch or network access
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "sentence-transformers")
+HASHING_DIM = 384  # same width as all-MiniLM-L6-v2
+
+class HashingEmbedder:
+    """Deterministic bag-of-words embeddings via signed feature hashing.
+
+    No model download and no torch: texts sharing words get similar vectors,
+    which is enough to exercise indexing and search at realistic sizes.
+    """
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self._buckets = {}  # token -> (bucket, sign)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _bucket(self, token: str):
+        found = self._buckets.get(token)
+        if found is None:
+            h = zlib.crc32(token.encode("utf-8"))
+            found = self._buckets[token] = (h % self.dim, 1.0 if h & 0x8000_0000 else -1.0)
+        return found
+
+    def encode(self, texts, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                bucket, sign = self._bucket(token)
+                out[row, bucket] += sign
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+def embedder_name() -> str:
+    """Name of the configured embedder; embeddings of different ones never mix in caches"""
+    return f"hashing-{HASHING_DIM}" if EMBED_BACKEND == "hashing" else EMBED_MODEL_NAME
 
 def load_embedder():
-    """Return a SentenceTransformer instance for embedding texts."""
+    """Return the configured embedder (a SentenceTransformer unless EMBED_BACKEND=hashing)."""
+    if EMBED_BACKEND == "hashing":
+        return HashingEmbedder()
+    from sentence_transformers import SentenceTransformer
     return SentenceTransformer(EMBED_MODEL_NAME)
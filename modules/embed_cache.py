@@ -0,0 +1,177 @@
+# modules/embed_cache.py
+import json
+import hashlib
+import threading
+from pathlib import Path
+import numpy as np
+
+from modules.file_lock import locked
+
+CACHE_DIR = Path("index") / "embeddings"
+MAX_ENTRIES = 200_000  # rows kept per model before least-recently-used ones are evicted
+EVICT_FRACTION = 0.1  # share of rows freed in one eviction pass
+MIN_CAPACITY = 1024
+
+class EmbeddingCache:
+    """Content-addressed embedding cache shared by indexing and search.
+
+    Vectors are rows of a memory-mapped float32 matrix, keyed by
+    (model name, sha256 of the text). Each row also stores its digest, so the
+    key index is rebuilt from disk on open and a row overwritten by another
+    process is detected as a miss instead of returning the wrong vector.
+
+    The bot and the GUI share the files. Writers take write.lock and pick free
+    rows (all-zero digest) from disk under it, and write a row's digest last;
+    readers check the digest again after copying the vector.
+    """
+
+    def __init__(self, model_name: str, root: Path = CACHE_DIR, max_entries: int = MAX_ENTRIES):
+        self.model_name = model_name
+        self.dir = Path(root) / model_name.replace("/", "__")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._keys = {}  # digest -> row
+        self._free = []
+        self._tick = 0
+        self._dim = None
+        self._capacity = 0
+        self._vectors = self._digests = self._ticks = None
+        self._load()
+
+    def _load(self):
+        """Map the files written so far (by this or another process), if any"""
+        header = self.dir / "header.json"
+        if not header.exists():
+            return
+        self._dim = json.loads(header.read_text(encoding="utf-8"))["dim"]
+        self._capacity = (self.dir / "vectors.f32").stat().st_size // (4 * self._dim)
+        self._open()
+        for row, digest in enumerate(self._digests):
+            if digest.any():
+                self._keys[digest.tobytes()] = row
+        self._tick = int(self._ticks.max(initial=0))
+
+    def _open(self):
+        self._vectors = np.memmap(self.dir / "vectors.f32", dtype="float32", mode="r+",
+                                  shape=(self._capacity, self._dim))
+        self._digests = np.memmap(self.dir / "digests.u8", dtype="uint8", mode="r+",
+                                  shape=(self._capacity, 32))
+        self._ticks = np.memmap(self.dir / "ticks.i64", dtype="int64", mode="r+",
+                                shape=(self._capacity,))
+
+    def _sync(self):
+        """Under write.lock: remap files another process has grown and take the
+        free rows from disk, since other writers have claimed rows as well"""
+        capacity = (self.dir / "vectors.f32").stat().st_size // (4 * self._dim)
+        if capacity > self._capacity:
+            self.flush()
+            self._capacity = capacity
+            self._open()
+        self._free = np.flatnonzero(~self._digests.any(axis=1))[::-1].tolist()
+
+    def _grow(self, capacity: int):
+        """Extend the backing files to `capacity` rows and remap them"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        if self._vectors is not None:
+            self.flush()
+            self._vectors = self._digests = self._ticks = None
+        for name, row_bytes in (("vectors.f32", 4 * self._dim), ("digests.u8", 32), ("ticks.i64", 8)):
+            with open(self.dir / name, "ab") as f:
+                # Never shrink: another process may already have grown the file further
+                f.truncate(max(f.tell(), capacity * row_bytes))
+        (self.dir / "header.json").write_text(json.dumps({"dim": self._dim}), encoding="utf-8")
+        self._free.extend(range(capacity - 1, self._capacity - 1, -1))
+        self._capacity = capacity
+        self._open()
+
+    def _evict(self):
+        """Free the least recently used rows (of every process, under write.lock)"""
+        live = np.flatnonzero(self._digests.any(axis=1))
+        count = max(1, int(len(live) * EVICT_FRACTION))
+        oldest = live[np.argsort(self._ticks[live], kind="stable")[:count]]
+        self._digests[oldest] = 0  # readers copying these rows now see a miss
+        self._free.extend(oldest.tolist())
+        freed = set(oldest.tolist())
+        self._keys = {digest: row for digest, row in self._keys.items() if row not in freed}
+        self.evictions += count
+
+    def _allocate(self) -> int:
+        if not self._free:
+            if self._capacity < self.max_entries:
+                self._grow(min(self.max_entries, max(MIN_CAPACITY, self._capacity * 2)))
+            else:
+                self._evict()
+        return self._free.pop()
+
+    def _lookup(self, digest: bytes):
+        row = self._keys.get(digest)
+        if row is None or self._digests[row].tobytes() != digest:
+            return None
+        self._tick += 1
+        self._ticks[row] = self._tick
+        return row
+
+    def encode(self, texts: list[str], encode_fn) -> np.ndarray:
+        """Return embeddings for texts, calling encode_fn only for texts not cached yet"""
+        digests = [hashlib.sha256(t.encode("utf-8")).digest() for t in texts]
+        cached, missing = {}, {}
+        with self._lock:
+            for text, digest in zip(texts, digests):
+                if digest in cached or digest in missing:
+                    continue
+                row = self._lookup(digest) if self._dim else None
+                if row is not None:
+                    vector = np.array(self._vectors[row])
+                    # Another process may have reused the row while it was copied
+                    if self._digests[row].tobytes() == digest:
+                        cached[digest] = vector
+                        continue
+                missing[digest] = text
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+
+        if missing:
+            vectors = np.asarray(encode_fn(list(missing.values())), dtype="float32")
+            fresh = dict(zip(missing, vectors))
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with self._lock, locked(self.dir / "write.lock"):
+                if self._dim is None:
+                    self._load()  # created by another process meanwhile
+                if self._dim is None:
+                    self._dim = vectors.shape[1]
+                else:
+                    self._sync()
+                for digest, vec in fresh.items():
+                    row = self._allocate()
+                    self._tick += 1
+                    self._vectors[row] = vec
+                    self._ticks[row] = self._tick
+                    self._digests[row] = np.frombuffer(digest, dtype="uint8")  # last: marks the row valid
+                    self._keys[digest] = row
+            cached.update(fresh)
+
+        if not texts:
+            return np.empty((0, self._dim or 0), dtype="float32")
+        return np.stack([cached[d] for d in digests])
+
+    def flush(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._digests.flush()
+            self._ticks.flush()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._keys),
+            "capacity": self._capacity,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
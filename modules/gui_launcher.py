@@ -11,6 +11,7 @@ import PySimpleGUI as sg
 import modules.transcribe as transcription
 import modules.summarize as summarization
 import modules.search as search_module
+from modules.query_parser import parse_query
 
 # Ensure required directories exist
 os.makedirs('meetings', exist_ok=True)
@@ -84,14 +85,12 @@ while True:
         try:
             # Copy source file for record
             shutil.copy(file_path, meeting_folder)
-            # Transcribe and summarize
-            transcript = transcription.transcribe(file_path)
-            summary = summarization.summarize(transcript)
-            # Save outputs
-            with open(os.path.join(meeting_folder, 'transcript.txt'), 'w', encoding='utf-8') as f:
-                f.write(transcript)
-            with open(os.path.join(meeting_folder, 'summary.txt'), 'w', encoding='utf-8') as f:
-                f.write(summary)
+            # Transcribe and summarize into the meeting folder; summaries go through
+            # the shared summarization worker like the bot's
+            transcript_path = os.path.join(meeting_folder, 'transcript.txt')
+            summary_path = os.path.join(meeting_folder, 'summary.txt')
+            transcription.transcribe(file_path, transcript_path)
+            summarization.summarize(transcript_path, summary_path)
             window['-LOG-'].print("Transcription and summarization complete.")
         except Exception as e:
             window['-LOG-'].print(f"Error during processing: {e}")
@@ -103,12 +102,13 @@ while True:
             sg.popup_error("Enter a search query.")
             continue
         try:
-            results = search_module.search(query)
-            # Assume results is a list of strings or single string
-            if isinstance(results, list):
-                window['-RESULT-'].update('\n\n'.join(results))
-            else:
-                window['-RESULT-'].update(results)
+            # Dates in the query ("last month") restrict the search to those meetings
+            date_ranges = parse_query(query)["date_ranges"]
+            results = search_module.query_faiss(query, k=5, date_ranges=date_ranges)
+            window['-RESULT-'].update('\n\n'.join(
+                f"{r['date']} - {r['slug'].replace('-', ' ').title()}\n{r['content'][:300].strip()}"
+                for r in results
+            ) or "No past meetings matched.")
         except Exception as e:
             window['-RESULT-'].update(f"Search error: {e}")
 
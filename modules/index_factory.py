@@ -0,0 +1,323 @@
+# modules/index_factory.py
+import os
+import sys
+import json
+import math
+import time
+import tempfile
+import subprocess
+from pathlib import Path
+import faiss
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Memory the vector index may use, in MB (set SEARCH_MEMORY_BUDGET_MB to override)
+MEMORY_BUDGET = int(os.getenv("SEARCH_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024
+FLAT_MAX_VECTORS = 20_000  # below this a brute-force scan is fast enough
+HNSW_M = 32
+PQ_SUBQUANTIZERS = (64, 48, 32, 24, 16, 8)  # tried largest first; must divide the dimension
+MIN_TRAIN_PER_LIST = 39  # faiss wants ~39 training points per IVF list
+MAX_TRAIN_VECTORS = 100_000
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+# How vectors are stored: "auto" keeps float32 until the budget forces IVF-PQ,
+# "fp16" / "sq8" store 2 / 1 bytes per dimension, "pq" always uses IVF-PQ codes
+STORAGE_OPTIONS = ("auto", "fp16", "sq8", "pq")
+VECTOR_STORAGE = os.getenv("SEARCH_VECTOR_STORAGE", "auto")
+# Open indexes memory-mapped so the bot, GUI and other processes share the page cache
+INDEX_MMAP = os.getenv("SEARCH_INDEX_MMAP", "1") != "0"
+_CODECS = {"fp16": ("SQfp16", 2), "sq8": ("SQ8", 1)}
+
+def _nlist(n: int) -> int:
+    return max(1, min(int(4 * math.sqrt(n)), n // MIN_TRAIN_PER_LIST))
+
+def choose_index_spec(n: int, dim: int, memory_budget: int = MEMORY_BUDGET,
+                      storage: str = VECTOR_STORAGE) -> str:
+    """Pick a faiss index_factory string for n vectors of size dim"""
+    if storage not in STORAGE_OPTIONS:
+        raise ValueError(f"Unknown vector storage {storage!r}, expected one of {STORAGE_OPTIONS}")
+    nlist = _nlist(n)
+    if storage == "pq":
+        m = next(m for m in PQ_SUBQUANTIZERS if dim % m == 0)
+        return f"IVF{nlist},PQ{m}"
+
+    codec, bytes_per_dim = _CODECS.get(storage, ("Flat", 4))
+    vector_bytes = n * dim * bytes_per_dim
+    if n <= FLAT_MAX_VECTORS and vector_bytes <= memory_budget:
+        return codec
+
+    # HNSW keeps the (possibly compressed) vectors plus ~2*M neighbour links per vector
+    if vector_bytes + n * HNSW_M * 2 * 4 <= memory_budget:
+        return f"HNSW{HNSW_M}" if codec == "Flat" else f"HNSW{HNSW_M},{codec}"
+
+    for m in PQ_SUBQUANTIZERS:
+        if dim % m == 0 and n * (m + 8) + nlist * dim * 4 <= memory_budget:
+            return f"IVF{nlist},PQ{m}"
+    return f"IVF{nlist},PQ{min(m for m in PQ_SUBQUANTIZERS if dim % m == 0)}"
+
+def make_index(spec: str, dim: int):
+    """Create an empty index that accepts add_with_ids (IVF natively, others via IDMap)"""
+    if spec.startswith("IVF"):
+        return faiss.index_factory(dim, spec)
+    return faiss.index_factory(dim, f"IDMap,{spec}")
+
+def _min_train(spec: str) -> int:
+    """Fewest vectors the spec can be trained on (PQ codebooks have 256 centroids)"""
+    nlist = int(spec[3:].split(",", 1)[0]) if spec.startswith("IVF") else 1
+    return max(nlist, 256) if "PQ" in spec else nlist
+
+def train_size(spec: str) -> int:
+    """Number of vectors to collect before training, 0 for indexes that need none"""
+    if not (spec.startswith("IVF") or "PQ" in spec or "SQ8" in spec):
+        return 0
+    return min(MAX_TRAIN_VECTORS, _min_train(spec) * MIN_TRAIN_PER_LIST)
+
+def read_index(path, mmap: bool = INDEX_MMAP):
+    """Read an index for searching; with mmap IVF inverted lists (and, where faiss
+    has IO_FLAG_MMAP_IFC, flat / SQ / HNSW vectors) stay in the file's page cache
+    instead of a private copy. Mapped indexes are read-only."""
+    if not mmap:
+        return faiss.read_index(str(path))
+    # IVF inverted lists map with IO_FLAG_MMAP; flat codes need IO_FLAG_MMAP_IFC, which
+    # the pinned faiss-cpu 1.7.4 lacks: there they are read into private memory
+    try:
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+                                | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+def write_index(index, path):
+    """Write through a temporary file and rename, so processes that have the old
+    file mapped keep reading intact pages"""
+    tmp = f"{path}.tmp"
+    faiss.write_index(index, tmp)
+    os.replace(tmp, str(path))
+
+def _code_size(inner) -> int:
+    if isinstance(inner, faiss.IndexHNSW):
+        inner = faiss.downcast_index(inner.storage)
+    if isinstance(inner, (faiss.IndexIVF, faiss.IndexFlatCodes)):
+        return int(inner.code_size)
+    return inner.d * 4
+
+def index_params(index) -> dict:
+    """Describe an index for the params file written next to it"""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    params = {"type": type(inner).__name__, "ntotal": index.ntotal, "dim": index.d}
+    if isinstance(inner, faiss.IndexIVF):
+        params["nlist"] = inner.nlist
+        params["nprobe"] = DEFAULT_NPROBE
+    if isinstance(inner, faiss.IndexIVFPQ):
+        params["pq_m"] = inner.pq.M
+    params["bytes_per_vector"] = _code_size(inner)
+    if isinstance(inner, faiss.IndexHNSW):
+        params["hnsw_m"] = HNSW_M
+        params["ef_search"] = DEFAULT_EF_SEARCH
+    return params
+
+
+class IndexBuilder:
+    """Streams (vectors, ids) into the index chosen by choose_index_spec.
+
+    IVF, PQ and SQ8 indexes are trained on the first train_size() vectors, which
+    are buffered until then. A previously trained empty index can be passed in to
+    skip training when the spec hasn't changed.
+    """
+
+    def __init__(self, expected: int, dim: int, memory_budget: int = MEMORY_BUDGET, trained=None,
+                 storage: str = VECTOR_STORAGE):
+        self.spec = choose_index_spec(expected, dim, memory_budget, storage)
+        self.dim = dim
+        self.index = trained if trained is not None else make_index(self.spec, dim)
+        self.trained = None
+        self._pending = []
+        self._pending_count = 0
+
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray):
+        if self.index.is_trained:
+            self.index.add_with_ids(vectors, ids)
+            return
+        self._pending.append((vectors, ids))
+        self._pending_count += len(vectors)
+        if self._pending_count >= train_size(self.spec):
+            self._train()
+
+    def _train(self):
+        vectors = np.concatenate([v for v, _ in self._pending])
+        ids = np.concatenate([i for _, i in self._pending])
+        self._pending, self._pending_count = [], 0
+
+        if len(vectors) < _min_train(self.spec):
+            # Far fewer vectors than expected: not enough to train, so stay exact
+            self.spec = "Flat"
+            self.index = make_index(self.spec, self.dim)
+        else:
+            self.index.train(vectors[:MAX_TRAIN_VECTORS])
+            self.trained = faiss.clone_index(self.index)
+        self.index.add_with_ids(vectors, ids)
+
+    def finish(self):
+        if self._pending:
+            self._train()
+        return self.index
+
+
+def search(index, queries: np.ndarray, k: int, nprobe: int = None, ef_search: int = None,
+           ids: np.ndarray = None):
+    """index.search with per-call nprobe / efSearch, safe to use on a shared index.
+    If ids is given, only vectors with those labels are scored."""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    sel = None
+    if ids is not None:
+        if inner is not index:
+            # The wrapped index only knows positions, so select the positions of those labels
+            id_map = faiss.rev_swig_ptr(index.id_map.data(), index.id_map.size())
+            ids = np.flatnonzero(np.isin(id_map, ids)).astype("int64")
+        ids = np.ascontiguousarray(ids, dtype="int64")
+        sel = faiss.IDSelectorBatch(ids.size, faiss.swig_ptr(ids))
+    params = None
+    if isinstance(inner, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = nprobe or DEFAULT_NPROBE
+    elif isinstance(inner, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search or DEFAULT_EF_SEARCH
+    if sel is not None:
+        params = params or faiss.SearchParameters()
+        params.sel = sel
+    if params is None:
+        return index.search(queries, k)
+    if inner is index:
+        return index.search(queries, k, params=params)
+
+    # Older IndexIDMap.search ignores params, so search the wrapped index and translate labels
+    distances, positions = inner.search(queries, k, params=params)
+    id_map = faiss.rev_swig_ptr(index.id_map.data(), index.id_map.size())
+    labels = np.where(positions >= 0, id_map[np.maximum(positions, 0)], -1)
+    return distances, labels
+
+def recall_report(vectors: np.ndarray, queries: np.ndarray, k: int = 10,
+                  memory_budget: int = MEMORY_BUDGET) -> list[dict]:
+    """Recall@k and latency of the candidate index types against an exact Flat search"""
+    n, dim = vectors.shape
+    ids = np.arange(n, dtype="int64")
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(vectors)
+    start = time.perf_counter()
+    _, truth = exact.search(queries, k)
+    rows = [{"spec": "Flat", "setting": "exact", "recall": 1.0,
+             "ms_per_query": 1000 * (time.perf_counter() - start) / len(queries)}]
+
+    nlist = _nlist(n)
+    pq_m = next(m for m in PQ_SUBQUANTIZERS if dim % m == 0)
+    candidates = [(f"HNSW{HNSW_M}", "ef_search", (16, 32, 64, 128, 256))]
+    if n >= max(nlist, 256):
+        candidates.append((f"IVF{nlist},PQ{pq_m}", "nprobe", (1, 4, 16, 64, nlist)))
+
+    for spec, knob, values in candidates:
+        index = make_index(spec, dim)
+        if not index.is_trained:
+            index.train(vectors[:MAX_TRAIN_VECTORS])
+        index.add_with_ids(vectors, ids)
+        for value in values:
+            start = time.perf_counter()
+            _, found = search(index, queries, k, **{knob: value})
+            elapsed = time.perf_counter() - start
+            hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+            rows.append({
+                "spec": spec,
+                "setting": f"{knob}={value}",
+                "recall": round(hits / truth.size, 4),
+                "ms_per_query": 1000 * elapsed / len(queries),
+            })
+    chosen = choose_index_spec(n, dim, memory_budget)
+    for row in rows:
+        row["ms_per_query"] = round(row["ms_per_query"], 4)
+        row["chosen"] = row["spec"] == chosen
+    return rows
+
+def _rss() -> int:
+    """Resident set size of this process in bytes, or 0 if it can't be read"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def _private_rss() -> int:
+    """Resident memory of this process not backed by shared file pages (mapped
+    index files sit in the page cache, shared with every other reader)"""
+    try:
+        with open("/proc/self/statm") as f:
+            fields = f.read().split()
+        return (int(fields[1]) - int(fields[2])) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return _rss()
+
+def storage_report(vectors: np.ndarray, queries: np.ndarray, k: int = 10,
+                   memory_budget: int = MEMORY_BUDGET) -> list[dict]:
+    """On-disk size, resident memory (read into RAM vs. memory-mapped, and the part of
+    the mapped one not shared through the page cache) and recall@k of each storage
+    option against an exact float32 search. Each load is measured in its own subprocess."""
+    n, dim = vectors.shape
+    ids = np.arange(n, dtype="int64")
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        queries_path = os.path.join(tmp, "queries.npy")
+        np.save(queries_path, queries)
+        for storage in STORAGE_OPTIONS:
+            builder = IndexBuilder(n, dim, memory_budget, storage=storage)
+            builder.add_with_ids(vectors, ids)
+            index = builder.finish()
+            if storage != "auto" and builder.spec in {row["spec"] for row in rows}:
+                continue  # too few vectors to train, fell back to a spec already measured
+            path = os.path.join(tmp, f"{storage}.index")
+            faiss.write_index(index, path)
+            del index
+
+            row = {"storage": storage, "spec": builder.spec, "disk_bytes": os.path.getsize(path)}
+            for key, mmap in (("rss_bytes", False), ("mmap_rss_bytes", True)):
+                measured = _measure_in_subprocess(path, queries_path, k, mmap)
+                row[key] = measured["rss_bytes"]
+            row["mmap_private_bytes"] = measured["private_bytes"]
+            found = np.array(measured["found"])
+            row["recall"] = round(sum(len(set(f) & set(t)) for f, t in zip(found, truth)) / truth.size, 4)
+            row["ms_per_query"] = round(1000 * measured["seconds"] / len(queries), 4)
+            rows.append(row)
+    return rows
+
+def _measure_in_subprocess(path: str, queries_path: str, k: int, mmap: bool) -> dict:
+    """Load and search one index in a fresh interpreter, so its RSS growth is the index's
+    own and not what this process happens to have freed or kept from earlier ones"""
+    code = ("import sys, json; from modules.index_factory import _measure; "
+            "print(json.dumps(_measure(sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4] == '1')))")
+    out = subprocess.run(
+        [sys.executable, "-c", code, path, queries_path, str(k), "1" if mmap else "0"],
+        cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.splitlines()[-1])
+
+def _measure(path: str, queries_path: str, k: int, mmap: bool) -> dict:
+    """RSS growth from loading and searching an index, its search time and results"""
+    queries = np.load(queries_path)
+    before, private_before = _rss(), _private_rss()
+    loaded = read_index(path, mmap=mmap)
+    start = time.perf_counter()
+    _, found = search(loaded, queries, k)
+    elapsed = time.perf_counter() - start
+    return {
+        "rss_bytes": max(0, _rss() - before),
+        "private_bytes": max(0, _private_rss() - private_before),
+        "seconds": elapsed,
+        "found": found.tolist(),
+    }
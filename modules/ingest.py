@@ -0,0 +1,149 @@
+# modules/ingest.py
+import os
+import json
+import hashlib
+import logging
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from modules.disk_cache import DiskCache, CACHE_DIR, hard_link
+from modules.transcribe import FFMPEG
+
+MEDIA_CACHE_DIR = Path(os.getenv("MEDIA_CACHE_DIR", CACHE_DIR / "media"))
+# Normalized audio, transcripts and summaries kept per recording; 0 = no limit
+MEDIA_CACHE_MB = int(os.getenv("MEDIA_CACHE_MB", "2048"))
+HASH_BLOCK = 1 << 20
+# Files cached per recording and copied into new meeting folders
+MEETING_FILES = ("transcript.txt", "transcript.json", "transcript.srt", "segments.npy", "summary.txt")
+# Normalized audio a job in a meeting folder is transcribing, and the media hash it was made from
+WORK_AUDIO = "audio.wav"
+WORK_AUDIO_SOURCE = "audio.sha256"
+# Media hash of the recording a meeting folder belongs to
+SOURCE_FILE = "source.sha256"
+
+media_cache = DiskCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MB * 1024 * 1024)
+
+def media_hash(path: Path) -> str:
+    """sha256 of a media file's bytes, the key of everything derived from it"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _read_digest(path: Path) -> Optional[str]:
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+def meeting_folder(parent: Path, name: str, digest: str) -> Path:
+    """Claim parent/name for the recording `digest`, or parent/name-<digest[:8]>
+    when another recording has it (two untitled voice notes on one day), so
+    concurrent uploads never share a folder. Creating the folder is the claim;
+    the digest written into it lets a later upload of the same recording reuse it."""
+    parent.mkdir(parents=True, exist_ok=True)
+    for folder in (parent / name, parent / f"{name}-{digest[:8]}", parent / f"{name}-{digest}"):
+        try:
+            folder.mkdir()
+        except FileExistsError:
+            if _read_digest(folder / SOURCE_FILE) != digest:
+                continue
+        (folder / SOURCE_FILE).write_text(digest, encoding="utf-8")
+        return folder
+    raise FileExistsError(f"No free meeting folder for {name} in {parent}")
+
+def normalized_audio(media: Path, digest: str, folder: Path) -> Path:
+    """16 kHz mono WAV of `media` (what whisper works on) as `folder`/WORK_AUDIO,
+    converted once per recording; the media itself if ffmpeg isn't available.
+
+    The meeting folder gets its own hard link (a copy across filesystems), so
+    evicting the cache entry while the job still reads the file doesn't pull it
+    away; the caller deletes it with release_audio once transcription is done.
+    A WORK_AUDIO left by an interrupted job is reused only if WORK_AUDIO_SOURCE
+    says it was made from the same recording.
+    """
+    work = folder / WORK_AUDIO
+    source = folder / WORK_AUDIO_SOURCE
+    if work.exists() and _read_digest(source) == digest:
+        return work
+    source.unlink(missing_ok=True)
+    tmp = work.with_name(f".{WORK_AUDIO}")
+    cached = media_cache.get(digest, "audio.wav")
+    if cached:
+        try:
+            if not hard_link(cached, work):
+                shutil.copyfile(cached, tmp)
+                os.replace(tmp, work)
+            source.write_text(digest, encoding="utf-8")
+            return work
+        except FileNotFoundError:  # evicted just now: convert again
+            pass
+    if not shutil.which(FFMPEG):
+        return media
+    subprocess.run(
+        [FFMPEG, "-hide_banner", "-loglevel", "error", "-y", "-i", str(media),
+         "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le", "-f", "wav", str(tmp)],
+        check=True,
+    )
+    os.replace(tmp, work)
+    source.write_text(digest, encoding="utf-8")
+    media_cache.put(digest, "audio.wav", work, link=True)
+    return work
+
+def release_audio(folder: Path):
+    """Delete a meeting folder's WORK_AUDIO once it has been transcribed"""
+    (folder / WORK_AUDIO).unlink(missing_ok=True)
+    (folder / WORK_AUDIO_SOURCE).unlink(missing_ok=True)
+
+def lookup(digest: str) -> Optional[dict]:
+    """What is known about a recording that was processed before:
+    {"meeting": folder it was first stored in, "files": {name: cached path}}"""
+    info = media_cache.get_json(digest, "meeting.json")
+    if info is None:
+        return None
+    files = {name: media_cache.get(digest, name) for name in MEETING_FILES}
+    files = {name: path for name, path in files.items() if path}
+    if "transcript.txt" not in files or "summary.txt" not in files:
+        return None
+    return {"meeting": Path(info["meeting"]), "files": files}
+
+def existing_meeting(digest: str) -> Optional[Path]:
+    """Meeting folder that already holds this recording's summary, if any"""
+    found = lookup(digest)
+    if found and (found["meeting"] / "summary.txt").exists():
+        return found["meeting"]
+    return None
+
+def restore(digest: str, folder: Path) -> bool:
+    """Copy the cached transcript and summary of a recording into `folder`.
+    Copies rather than hard links: the files are small and get rewritten in place."""
+    found = lookup(digest)
+    if found is None:
+        return False
+    folder.mkdir(parents=True, exist_ok=True)
+    for name, path in found["files"].items():
+        shutil.copyfile(path, folder / name)
+    logging.info(f"Reused cached transcript and summary of {digest[:12]} in {folder}")
+    return True
+
+def remember(digest: str, folder: Path):
+    """Cache a processed meeting's transcript and summary under its media hash"""
+    for name in MEETING_FILES:
+        path = folder / name
+        if path.exists():
+            media_cache.put(digest, name, path)
+    media_cache.put_json(digest, "meeting.json", {"meeting": folder.as_posix()})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or trim the media cache")
+    parser.add_argument("--evict", action="store_true", help="evict down to MEDIA_CACHE_MB now")
+    args = parser.parse_args()
+    if args.evict:
+        media_cache.evict()
+    print(json.dumps(media_cache.stats(), indent=1))
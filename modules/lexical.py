@@ -0,0 +1,239 @@
+# modules/lexical.py
+import os
+import re
+import json
+import math
+import shutil
+from collections import Counter
+from pathlib import Path
+import numpy as np
+
+LEXICAL_DIR = Path("index") / "lexical"
+# Keeps names, ticket numbers and product codes whole: "abc-123", "v2.1", "q3_budget"
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_SEGMENTS = 8  # segments are merged into one beyond this
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def _encode_varints(values, out: bytearray):
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+def _decode_varints(buf: bytes) -> list[int]:
+    values, value, shift = [], 0, 0
+    for byte in buf:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value, shift = 0, 0
+    return values
+
+
+class _Segment:
+    """One immutable segment: documents, a sorted term dictionary and
+    varint-encoded (doc delta, term frequency) postings, memory-mapped."""
+
+    def __init__(self, directory: Path):
+        self.labels = np.load(directory / "docs.npy", mmap_mode="r")
+        self.lengths = np.load(directory / "lengths.npy", mmap_mode="r")
+        self.offsets = np.load(directory / "offsets.npy", mmap_mode="r")
+        self.dfs = np.load(directory / "dfs.npy", mmap_mode="r")
+        terms = (directory / "terms.txt").read_text(encoding="utf-8")
+        self.terms = {term: i for i, term in enumerate(terms.split("\n"))} if terms else {}
+        size = (directory / "postings.bin").stat().st_size
+        self.postings_buf = (np.memmap(directory / "postings.bin", dtype="uint8", mode="r")
+                             if size else np.empty(0, dtype="uint8"))
+
+    def postings(self, term: str):
+        """(doc ordinals, term frequencies) for term, or None"""
+        i = self.terms.get(term)
+        if i is None:
+            return None
+        values = _decode_varints(self.postings_buf[self.offsets[i]:self.offsets[i + 1]].tobytes())
+        docs = np.cumsum(values[0::2])
+        return docs, np.array(values[1::2])
+
+    @staticmethod
+    def write(directory: Path, docs: list):
+        """docs: list of (label, Counter of term frequencies)"""
+        directory.mkdir(parents=True, exist_ok=True)
+        postings = {}
+        for ordinal, (_, counts) in enumerate(docs):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((ordinal, tf))
+
+        terms = sorted(postings)
+        blob = bytearray()
+        offsets = [0]
+        for term in terms:
+            previous = 0
+            pairs = []
+            for ordinal, tf in postings[term]:
+                pairs += (ordinal - previous, tf)
+                previous = ordinal
+            _encode_varints(pairs, blob)
+            offsets.append(len(blob))
+
+        np.save(directory / "docs.npy", np.array([label for label, _ in docs], dtype="int64"))
+        np.save(directory / "lengths.npy", np.array([sum(c.values()) for _, c in docs], dtype="int32"))
+        np.save(directory / "offsets.npy", np.array(offsets, dtype="int64"))
+        np.save(directory / "dfs.npy", np.array([len(postings[t]) for t in terms], dtype="int32"))
+        (directory / "terms.txt").write_text("\n".join(terms), encoding="utf-8")
+        (directory / "postings.bin").write_bytes(bytes(blob))
+
+
+class LexicalIndex:
+    """BM25 inverted index over meeting text, stored as append-only segments.
+
+    Each update writes a small new segment and tombstones replaced or deleted
+    meetings in the older ones; once there are more than MAX_SEGMENTS they are
+    merged. Searching needs no embedding model.
+
+    The segment list lives in `manifest` (segments.json in the directory by
+    default). With a manifest elsewhere, several manifests can share the
+    segments, so merged-away segments are left for remove_unused_segments().
+    """
+
+    def __init__(self, directory: Path = LEXICAL_DIR, manifest: Path = None):
+        self.dir = Path(directory)
+        self.manifest = Path(manifest) if manifest else self.dir / "segments.json"
+        self._shared = manifest is not None
+        if self.manifest.exists():
+            state = json.loads(self.manifest.read_text(encoding="utf-8"))
+        else:
+            state = {"segments": [], "deleted": {}, "next": 1}
+        self._state = state
+        self._segments = {name: _Segment(self.dir / name) for name in state["segments"]}
+        self._deleted = {name: set(labels) for name, labels in state["deleted"].items()}
+
+    def _save(self):
+        self._state["deleted"] = {name: sorted(labels) for name, labels in self._deleted.items() if labels}
+        tmp = self.manifest.with_name(self.manifest.name + ".tmp")
+        tmp.write_text(json.dumps(self._state), encoding="utf-8")
+        os.replace(tmp, self.manifest)
+
+    def _add_segment(self, docs: list):
+        name = f"seg-{self._state['next']:06d}"
+        self._state["next"] += 1
+        _Segment.write(self.dir / name, docs)
+        self._state["segments"].append(name)
+        self._segments[name] = _Segment(self.dir / name)
+
+    def rebuild(self, docs):
+        """Replace the whole index with docs, an iterable of (label, text)"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        old = list(self._state["segments"])
+        self._state["segments"], self._segments, self._deleted = [], {}, {}
+        self._add_segment([(label, Counter(tokenize(text))) for label, text in docs])
+        self._save()
+        self._remove_segments(old)
+
+    def update(self, added: dict, removed=()):
+        """Add/replace meetings (label -> text) and drop `removed` labels"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        gone = set(removed) | set(added)
+        for name, segment in self._segments.items():
+            hit = gone.intersection(segment.labels.tolist())
+            if hit:
+                self._deleted.setdefault(name, set()).update(hit)
+        if added:
+            self._add_segment([(label, Counter(tokenize(text))) for label, text in added.items()])
+        if len(self._segments) > MAX_SEGMENTS:
+            self._merge()
+        self._save()
+
+    def _merge(self):
+        """Rewrite all live documents into a single segment"""
+        docs = []
+        for name in self._state["segments"]:
+            segment, deleted = self._segments[name], self._deleted.get(name, set())
+            counts = [Counter() for _ in segment.labels]
+            for term in segment.terms:
+                ordinals, tfs = segment.postings(term)
+                for ordinal, tf in zip(ordinals, tfs):
+                    counts[ordinal][term] = int(tf)
+            docs += [(int(label), c) for label, c in zip(segment.labels, counts) if int(label) not in deleted]
+        old = list(self._state["segments"])
+        self._state["segments"], self._segments, self._deleted = [], {}, {}
+        self._add_segment(docs)
+        self._save()
+        self._remove_segments(old)
+
+    def _remove_segments(self, names):
+        if self._shared:
+            return
+        for name in names:
+            for path in (self.dir / name).glob("*"):
+                path.unlink()
+            (self.dir / name).rmdir()
+
+    def search(self, query: str, k: int = 5, allowed: np.ndarray = None) -> list[tuple[int, float]]:
+        """Top-k (label, BM25 score), optionally limited to the `allowed` labels"""
+        terms = set(tokenize(query))
+        if not terms or not self._segments:
+            return []
+
+        # Document count, average length and document frequencies cover live
+        # documents only, so tombstones don't skew BM25 between merges
+        live, total_length, df, hits = 0, 0, Counter(), []
+        for name, segment in self._segments.items():
+            deleted = np.fromiter(self._deleted.get(name, ()), dtype="int64")
+            lengths = segment.lengths
+            if len(deleted):
+                lengths = lengths[~np.isin(segment.labels, deleted)]
+            live += len(lengths)
+            total_length += int(lengths.sum())
+            for term in terms:
+                found = segment.postings(term)
+                if found is None:
+                    continue
+                ordinals, tfs = found
+                labels = segment.labels[ordinals]
+                if len(deleted):
+                    keep = ~np.isin(labels, deleted)
+                    ordinals, tfs, labels = ordinals[keep], tfs[keep], labels[keep]
+                df[term] += len(labels)
+                hits.append((term, labels, tfs, segment.lengths[ordinals]))
+        avgdl = total_length / max(live, 1)
+
+        scores = Counter()
+        for term, labels, tfs, lengths in hits:
+            idf = math.log(1 + (live - df[term] + 0.5) / (df[term] + 0.5))
+            weights = idf * tfs * (BM25_K1 + 1) / (
+                tfs + BM25_K1 * (1 - BM25_B + BM25_B * lengths / avgdl))
+            for label, weight in zip(labels.tolist(), weights.tolist()):
+                scores[label] += weight
+
+        if allowed is not None:
+            keep = set(allowed.tolist())
+            scores = Counter({label: s for label, s in scores.items() if label in keep})
+        return scores.most_common(k)
+
+
+def remove_unused_segments(directory: Path, manifests) -> int:
+    """Delete segments none of `manifests` reference. The last manifest is the
+    newest; segments numbered from its "next" on may belong to an update still
+    in progress and are kept. Returns the number removed."""
+    directory = Path(directory)
+    live, next_number = set(), None
+    for manifest in manifests:
+        state = json.loads(Path(manifest).read_text(encoding="utf-8"))
+        live.update(state["segments"])
+        next_number = state["next"]
+    if next_number is None or not directory.exists():
+        return 0
+
+    removed = 0
+    for path in directory.glob("seg-*"):
+        if path.name not in live and int(path.name[4:]) < next_number:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
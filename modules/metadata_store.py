@@ -0,0 +1,107 @@
+# modules/metadata_store.py
+from pathlib import Path
+import numpy as np
+
+MEETINGS_DIR = Path("meetings")
+
+class MeetingStore:
+    """Columnar meeting metadata, memory-mapped on load.
+
+    Labels and dates (as YYYYMMDD integers) are parallel arrays sorted by label;
+    slugs live once each in a UTF-8 string table. The meeting ID, year/month/day
+    strings and summary path are derived from those columns, and the summary text
+    is only read from summary.txt for the hits a query actually returns.
+    """
+
+    FILES = ("dates.npy", "slugs.npy", "strings.bin", "string_offsets.npy", "labels.npy")
+
+    def __init__(self, directory: Path):
+        directory = Path(directory)
+        self.dates = np.load(directory / "dates.npy", mmap_mode="r")
+        self.slug_refs = np.load(directory / "slugs.npy", mmap_mode="r")
+        self.offsets = np.load(directory / "string_offsets.npy", mmap_mode="r")
+        self.strings = (np.memmap(directory / "strings.bin", dtype="uint8", mode="r")
+                        if (directory / "strings.bin").stat().st_size else np.empty(0, dtype="uint8"))
+        self.labels = np.load(directory / "labels.npy", mmap_mode="r")
+        self._slugs = {}
+
+    @staticmethod
+    def write(directory: Path, metas):
+        """Write records (dicts with label, date and slug) as a new store"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        records = sorted(metas, key=lambda meta: meta["label"])
+
+        table, refs, interned = [], [], {}
+        for meta in records:
+            ref = interned.get(meta["slug"])
+            if ref is None:
+                ref = interned[meta["slug"]] = len(table)
+                table.append(meta["slug"].encode("utf-8"))
+            refs.append(ref)
+        offsets = np.zeros(len(table) + 1, dtype="int64")
+        np.cumsum([len(b) for b in table], out=offsets[1:])
+
+        np.save(directory / "dates.npy", np.array(
+            [int(meta["date"][:10].replace("-", "")) for meta in records], dtype="int32"))
+        np.save(directory / "slugs.npy", np.array(refs, dtype="int32"))
+        (directory / "strings.bin").write_bytes(b"".join(table))
+        np.save(directory / "string_offsets.npy", offsets)
+        # Labels last: their mtime marks a complete store
+        np.save(directory / "labels.npy", np.array([meta["label"] for meta in records], dtype="int64"))
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def _row(self, label: int):
+        row = int(np.searchsorted(self.labels, label))
+        if row < len(self.labels) and self.labels[row] == label:
+            return row
+        return None
+
+    def __contains__(self, label: int) -> bool:
+        return self._row(label) is not None
+
+    def _slug(self, ref: int) -> str:
+        slug = self._slugs.get(ref)
+        if slug is None:
+            start, end = self.offsets[ref], self.offsets[ref + 1]
+            slug = self._slugs[ref] = self.strings[start:end].tobytes().decode("utf-8")
+        return slug
+
+    def _record(self, row: int) -> dict:
+        date = int(self.dates[row])
+        year, month, day = f"{date // 10000}", f"{date // 100 % 100:02d}", f"{date % 100:02d}"
+        slug = self._slug(int(self.slug_refs[row]))
+        return {
+            "id": f"{year}-{month}-{day}-{slug}",
+            "label": int(self.labels[row]),
+            "date": f"{year}-{month}-{day}T00:00:00",
+            "year": year,
+            "month": month,
+            "day": day,
+            "slug": slug,
+            "path": str(MEETINGS_DIR / year / month / slug / "summary.txt"),
+        }
+
+    def get(self, label: int, content: bool = False):
+        """Metadata dict for one meeting (optionally with its summary text), or None"""
+        row = self._row(label)
+        if row is None:
+            return None
+        record = self._record(row)
+        if content:
+            try:
+                record["content"] = Path(record["path"]).read_text(encoding="utf-8").strip()
+            except OSError:
+                record["content"] = ""
+        return record
+
+    def records(self):
+        """Iterate all metadata dicts, without summary text"""
+        for row in range(len(self.labels)):
+            yield self._record(row)
+
+    def labels_between(self, start: int, end: int) -> np.ndarray:
+        """Labels of meetings dated within [start, end], both YYYYMMDD integers"""
+        return np.asarray(self.labels[(self.dates >= start) & (self.dates <= end)])
@@ -1,11 +1,43 @@
-from datetime import datetime
+import re
+import calendar
+from datetime import datetime, timedelta
 import spacy
 import dateparser
-from typing import Optional, Dict, List, Tuple
+from typing import Dict, List, Tuple
 import logging
 
 nlp = spacy.load("en_core_web_sm")
 
+DATE_SETTINGS = {
+    'PREFER_DATES_FROM': 'past',  # meetings being searched have already happened
+    'RETURN_AS_TIMEZONE_AWARE': False
+}
+MONTH_NAMES = {name.lower() for name in (*calendar.month_name, *calendar.month_abbr) if name}
+
+def _expand_range(expr: str, parsed: datetime) -> Tuple[datetime, datetime]:
+    """
+    Widen a single parsed date to the period the expression refers to,
+    e.g. "last month" covers that whole month rather than one day.
+    """
+    text = expr.lower()
+    words = re.findall(r"[a-z]+|\d+", text)
+    has_day = any(w.isdigit() and len(w) <= 2 for w in words)
+    has_month_name = any(w in MONTH_NAMES for w in words)
+    day_start = parsed.replace(hour=0, minute=0, second=0, microsecond=0)
+    if "year" in text or (not has_day and not has_month_name and re.fullmatch(r"\D*\d{4}\D*", text)):
+        start = day_start.replace(month=1, day=1)
+        end = start.replace(year=start.year + 1)
+    elif "month" in text or (has_month_name and not has_day):  # "May", "in May", "May 2024"
+        start = day_start.replace(day=1)
+        end = start + timedelta(days=calendar.monthrange(start.year, start.month)[1])
+    elif "week" in text:
+        start = day_start - timedelta(days=day_start.weekday())
+        end = start + timedelta(days=7)
+    else:
+        start = day_start
+        end = start + timedelta(days=1)
+    return start, end - timedelta(microseconds=1)
+
 def parse_query(query: str) -> Dict[str, List[Tuple[datetime, datetime]]]:
     """
     Returns structured date ranges and keywords from query.
@@ -18,32 +50,28 @@ def parse_query(query: str) -> Dict[str, List[Tuple[datetime, datetime]]]:
         "topics": []
     }
 
-    # Extract date expressions and parse to date ranges
+    # Extract date expressions and parse to date ranges. Only explicit DATE
+    # entities count: the ranges filter the search, so a query without one
+    # (e.g. a ticket number) must not be restricted to some guessed date.
     date_expressions = [ent.text for ent in doc.ents if ent.label_ == "DATE"]
-    
-    # Fallback to full query parsing if no dates found
-    if not date_expressions:
-        date_expressions = [query]
-        
+
     for expr in date_expressions:
         try:
+            # Handle single date vs date ranges
+            if " to " in expr:
+                parts = [p.strip() for p in expr.split(" to ", 1)]
+                start_end = [dateparser.parse(p, settings=DATE_SETTINGS) for p in parts]
+                if all(start_end):
+                    results["date_ranges"].append((
+                        _expand_range(parts[0], start_end[0])[0],
+                        _expand_range(parts[1], start_end[1])[1],
+                    ))
+                continue
+
             # Get date range (start/end) for expression
-            parsed = dateparser.parse(
-                expr,
-                settings={
-                    'PREFER_DATES_FROM': 'future',
-                    'RETURN_AS_TIMEZONE_AWARE': False
-                }
-            )
-            
+            parsed = dateparser.parse(expr, settings=DATE_SETTINGS)
             if parsed:
-                # Handle single date vs date ranges
-                if " to " in expr or "-" in expr:
-                    start_end = [dateparser.parse(p) for p in expr.split(" to ")]
-                    if len(start_end) == 2 and all(start_end):
-                        results["date_ranges"].append((start_end[0], start_end[1]))
-                else:
-                    results["date_ranges"].append((parsed, parsed))
+                results["date_ranges"].append(_expand_range(expr, parsed))
         except Exception as e:
             logging.error(f"Date parsing error: {e}")
 
@@ -1,102 +1,826 @@
 import os
-import pickle
+import json
+import asyncio
+import tempfile
+import re
+import heapq
+import hashlib
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
+from modules.embed_cache import EmbeddingCache
+from modules import embed, index_factory, segments
+from modules.metadata_store import MeetingStore
+from modules.file_lock import locked
+from modules.lexical import LexicalIndex, remove_unused_segments
+
+MEETINGS_DIR = Path("meetings")
 INDEX_DIR = Path("index")
-INDEX_PATH = INDEX_DIR / "faiss.index"
-META_PATH = INDEX_DIR / "metadata.pkl"
-EMBED_MODEL = "all-MiniLM-L6-v2"
-embedder = SentenceTransformer(EMBED_MODEL)
+SHARDS_DIR = INDEX_DIR / "shards"  # one directory per meetings/YYYY/MM period
+# Each published index version is an immutable generation directory holding
+# shards.json, manifest.json, lexical.json and the meetings/ metadata store;
+# CURRENT names the live one and is replaced atomically
+GENERATIONS_DIR = INDEX_DIR / "generations"
+CURRENT_PATH = INDEX_DIR / "CURRENT"
+GENERATIONS_KEEP = 2  # newest generations never garbage-collected
+GENERATION_GRACE = 60.0  # seconds a superseded generation stays for readers in other processes
+PASSAGE_TRAINED_PATH = INDEX_DIR / "passages.trained"
+LEXICAL_DIR = INDEX_DIR / "lexical"
+# Held by whoever builds and publishes a generation (any thread or process)
+WRITE_LOCK_PATH = INDEX_DIR / "write.lock"
+EMBED_MODEL = embed.embedder_name()
+RELOAD_CHECK_INTERVAL = 2.0  # seconds between checks for a newer index on disk
+STATS_HISTORY = 10  # index generations kept in index_stats()
+PASSAGE_WORDS = 120  # words per transcript passage
+PASSAGE_STRIDE = 60  # words between passage starts (50% overlap)
+PASSAGE_BATCH = 256  # passages embedded per forward pass
+PASSAGE_OVERFETCH = 4  # passage hits fetched per requested result
+SEARCH_MODES = ("hybrid", "vector", "lexical")
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")
+RRF_K = 60  # reciprocal rank fusion constant
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))  # query embeddings kept in memory
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))  # seconds before one is re-encoded
+SEARCH_THREADS = int(os.getenv("SEARCH_THREADS", str(min(8, os.cpu_count() or 1))))  # shard fan-out
 
-def build_faiss_index():
-    """Build search index with proper date parsing and deduplication"""
-    INDEX_DIR.mkdir(exist_ok=True)
-    docs, metas = [], []
+# One fixed-width record per transcript passage; its row number is its FAISS label
+PASSAGE_DTYPE = np.dtype([("meeting", "<i8"), ("start", "<i8"), ("end", "<i8")])
 
-    for summ in Path("meetings").rglob("summary.txt"):
-        try:
-            parts = summ.parts
-            if len(parts) < 4:
-                continue  # Skip invalid paths
-
-            # Parse date from directory structure
-            year, month, day_slug = parts[1], parts[2], parts[3]
-            day = day_slug.split("-", 1)[0]
-            
-            # Read summary content
-            content = summ.read_text(encoding="utf-8").strip()
-            if not content:
-                continue
+_embedder = None
+_embed_cache = None
+
+def _get_embedder():
+    """Load the sentence embedding model on first use (cache hits never need it)"""
+    global _embedder
+    if _embedder is None:
+        _embedder = embed.load_embedder()
+    return _embedder
+
+def _get_embed_cache() -> EmbeddingCache:
+    global _embed_cache
+    if _embed_cache is None:
+        _embed_cache = EmbeddingCache(EMBED_MODEL)
+    return _embed_cache
+
+def _encode(texts: list[str]) -> np.ndarray:
+    """Embed texts through the on-disk embedding cache"""
+    return _get_embed_cache().encode(
+        texts, lambda missing: _get_embedder().encode(missing, convert_to_numpy=True)
+    )
+
+class QueryEmbeddingCache:
+    """In-memory LRU of normalized query text -> embedding, with a TTL"""
+
+    def __init__(self, size: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def encode(self, queries: list[str]) -> np.ndarray:
+        """Embeddings for queries; all misses are encoded in one forward pass"""
+        keys = [self.normalize(q) for q in queries]
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[1] < self.ttl:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[0]
+            missing = list(dict.fromkeys(key for key in keys if key not in found))
+            self.hits += len(keys) - sum(1 for key in keys if key in missing)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = _encode(missing)
+            with self._lock:
+                for key, vec in zip(missing, vectors):
+                    self._entries[key] = (vec, now)
+                    self._entries.move_to_end(key)
+                    found[key] = vec
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        return np.stack([found[key] for key in keys])
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_query_cache = QueryEmbeddingCache()
+
+def query_cache_stats() -> dict:
+    """Hit/miss counters of the in-memory query embedding LRU"""
+    return _query_cache.stats()
+
+def embedding_cache_stats() -> dict:
+    """Hit/miss counters and size of the embedding cache"""
+    return _get_embed_cache().stats()
+
+def _print_cache_stats():
+    stats = embedding_cache_stats()
+    print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+
+def _stable_id(meeting_id: str) -> int:
+    """Map a meeting ID to a FAISS label that survives rebuilds"""
+    digest = hashlib.sha1(meeting_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+def _read_meeting(summ: Path) -> Optional[dict]:
+    """Parse metadata for one summary.txt, or None if the summary is empty"""
+    parts = summ.parts
+    if len(parts) < 4:
+        raise ValueError("path is not meetings/YYYY/MM/DD-slug/summary.txt")
+
+    # Parse date from directory structure
+    year, month, day_slug = parts[1], parts[2], parts[3]
+    day = day_slug.split("-", 1)[0]
+
+    # Read summary content
+    content = summ.read_text(encoding="utf-8").strip()
+    if not content:
+        return None
+
+    # Create unique meeting ID
+    meeting_id = f"{year}-{month}-{day}-{summ.parent.name}"
+
+    return {
+        "id": meeting_id,
+        "label": _stable_id(meeting_id),
+        "date": datetime(int(year), int(month), int(day)).isoformat(),
+        "year": year,
+        "month": month,
+        "day": day,
+        "slug": summ.parent.name,
+        "content": content,
+        "path": str(summ)
+    }
+
+def _transcript_path(summary_path) -> Path:
+    return Path(summary_path).with_name("transcript.txt")
+
+def _mtime(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _manifest_entry(summ: Path, meta: dict) -> dict:
+    transcript = _transcript_path(summ)
+    transcript_mtime = _mtime(transcript)
+    return {
+        "label": meta["label"],
+        "mtime": summ.stat().st_mtime_ns,
+        "sha256": hashlib.sha256(meta["content"].encode("utf-8")).hexdigest(),
+        "transcript_mtime": transcript_mtime,
+        "transcript_sha256": (
+            hashlib.sha256(transcript.read_bytes()).hexdigest() if transcript_mtime else None
+        ),
+    }
+
+def _passage_spans(text: str):
+    """Yield (start, end) character offsets of overlapping word windows"""
+    words = [m.span() for m in re.finditer(r"\S+", text)]
+    for first in range(0, max(len(words) - PASSAGE_WORDS, 0) + PASSAGE_STRIDE, PASSAGE_STRIDE):
+        window = words[first:first + PASSAGE_WORDS]
+        if not window:
+            break
+        yield window[0][0], window[-1][1]
+        if first + PASSAGE_WORDS >= len(words):
+            break
+
+def _index_passages(passage_index, meetings, meta_file) -> int:
+    """Embed transcript passages of `meetings` in batches, streaming vectors into
+    passage_index and offset records into meta_file. Returns the number added."""
+    next_row = meta_file.tell() // PASSAGE_DTYPE.itemsize
+    added = 0
+    texts, records = [], []
+
+    def flush():
+        nonlocal next_row, added
+        if not texts:
+            return
+        rows = np.arange(next_row, next_row + len(texts), dtype="int64")
+        passage_index.add_with_ids(_encode(texts), rows)
+        meta_file.write(np.array(records, dtype=PASSAGE_DTYPE).tobytes())
+        next_row += len(texts)
+        added += len(texts)
+        texts.clear()
+        records.clear()
+
+    for meta in meetings:
+        transcript = _transcript_path(meta["path"])
+        if not transcript.exists():
+            continue
+        text = transcript.read_text(encoding="utf-8")
+        for start, end in _passage_spans(text):
+            texts.append(text[start:end])
+            records.append((meta["label"], start, end))
+            if len(texts) >= PASSAGE_BATCH:
+                flush()
+    flush()
+    return added
+
+def _lexical_text(meta: dict) -> str:
+    """Summary plus full transcript: exact names and codes are often only in the transcript"""
+    transcript = _transcript_path(meta["path"])
+    text = transcript.read_text(encoding="utf-8") if transcript.exists() else ""
+    return f"{meta['content']}\n{text}"
+
+def _passage_count(meetings) -> int:
+    """Number of passages _index_passages will produce, without embedding anything"""
+    count = 0
+    for meta in meetings:
+        transcript = _transcript_path(meta["path"])
+        if transcript.exists():
+            count += sum(1 for _ in _passage_spans(transcript.read_text(encoding="utf-8")))
+    return count
+
+def _shard_name(meta: dict) -> str:
+    """Shards follow the meetings/YYYY/MM/ layout"""
+    return f"{meta['year']}-{meta['month']}"
 
-            # Create unique meeting ID
-            meeting_id = f"{year}-{month}-{day}-{summ.parent.name}"
-            
-            metas.append({
-                "id": meeting_id,
-                "date": datetime(int(year), int(month), int(day)).isoformat(),
-                "year": year,
-                "month": month,
-                "day": day,
-                "slug": summ.parent.name,
-                "content": content,
-                "path": str(summ)
-            })
-            docs.append(content)
-            
+def _current_generation() -> Optional[Path]:
+    """Directory of the published generation, or None before the first build"""
+    try:
+        name = CURRENT_PATH.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return GENERATIONS_DIR / name if name else None
+
+def _generation_numbers() -> list[int]:
+    if not GENERATIONS_DIR.exists():
+        return []
+    return sorted(int(path.name) for path in GENERATIONS_DIR.iterdir() if path.name.isdigit())
+
+def _load_shard_manifest(generation: Optional[Path]) -> dict:
+    try:
+        return json.loads((generation / "shards.json").read_text(encoding="utf-8"))
+    except (TypeError, FileNotFoundError, ValueError):
+        return {"shards": {}, "next": 1}
+
+def _spec_family(spec: str) -> str:
+    return re.match(r"[A-Za-z]+", spec).group(0)
+
+def _build_shard(name: str, meetings: list, state: dict) -> dict:
+    """Embed one period's summaries and transcript passages into a new shard
+    directory and return its shard manifest entry. Directories are never
+    rewritten: each build gets a fresh numbered one."""
+    storage = state["storage"]
+    directory = SHARDS_DIR / f"{name}.{state['next']:06d}"
+    state["next"] += 1
+    # Numbers from "next" on were never published; a leftover is from a crashed build
+    shutil.rmtree(directory, ignore_errors=True)
+    directory.mkdir(parents=True)
+
+    # Summaries: one vector per meeting, labelled with its stable ID
+    embs = _encode([meta["content"] for meta in meetings])
+    dim = embs.shape[1]
+    builder = index_factory.IndexBuilder(len(meetings), dim, storage=storage)
+    builder.add_with_ids(embs, np.array([meta["label"] for meta in meetings], dtype="int64"))
+    index = builder.finish()
+
+    # Transcript passages are streamed in batches. nlist drifts with the count, so
+    # IVF-PQ training from an earlier shard or build is good enough to reuse
+    expected = _passage_count(meetings)
+    passage_builder = index_factory.IndexBuilder(expected, dim, storage=storage)
+    trained_spec = state.get("trained_spec")
+    if (_spec_family(passage_builder.spec) == "IVF" and trained_spec
+            and state.get("dim") == dim and PASSAGE_TRAINED_PATH.exists()):
+        trained = faiss.read_index(str(PASSAGE_TRAINED_PATH))
+        passage_builder = index_factory.IndexBuilder(expected, dim, trained=trained, storage=storage)
+        passage_builder.spec = trained_spec
+    with open(directory / "passages.meta", "wb") as meta_file:
+        passages = _index_passages(passage_builder, meetings, meta_file)
+    passage_index = passage_builder.finish()
+    if passage_builder.trained is not None:
+        index_factory.write_index(passage_builder.trained, PASSAGE_TRAINED_PATH)
+        state["trained_spec"] = passage_builder.spec
+    state["dim"] = dim
+
+    index_factory.write_index(index, directory / "faiss.index")
+    index_factory.write_index(passage_index, directory / "passages.index")
+    dates = [int(meta["date"][:10].replace("-", "")) for meta in meetings]
+    return {
+        "dir": directory.name,
+        "start": min(dates),
+        "end": max(dates),
+        "meetings": len(meetings),
+        "passages": passages,
+        "summaries": dict(index_factory.index_params(index), spec=builder.spec),
+        "passage_index": dict(index_factory.index_params(passage_index), spec=passage_builder.spec),
+    }
+
+_write_lock = threading.Lock()
+
+@contextmanager
+def _index_writer():
+    """Exclusive access for building and publishing a generation. Writers in one
+    process queue on a lock, writers in different processes on a lock file:
+    without it two builds take the same shard and generation numbers."""
+    INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    with _write_lock, locked(WRITE_LOCK_PATH):
+        yield
+
+def _discard(staging: Optional[Path], first_shard: int, state: dict):
+    """Remove what a failed build wrote: its staging directory and new shard directories"""
+    if staging is not None:
+        if not staging.exists():
+            return  # already renamed into a published generation, which uses the shards
+        shutil.rmtree(staging, ignore_errors=True)
+    for number in range(first_shard, state["next"]):
+        for directory in SHARDS_DIR.glob(f"*.{number:06d}"):
+            shutil.rmtree(directory, ignore_errors=True)
+
+def _stage() -> Path:
+    """Private directory for the next generation, invisible to readers until published"""
+    GENERATIONS_DIR.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(prefix=".staging-", dir=GENERATIONS_DIR))
+
+def _publish(staging: Path, state: dict, metas: dict, manifest: dict) -> Path:
+    """Complete the staged generation and make it current with one atomic rename of
+    CURRENT, so readers see either all of the old index or all of the new one"""
+    _get_embed_cache().flush()
+    MeetingStore.write(staging / "meetings", metas.values())
+    state["shards"] = dict(sorted(state["shards"].items()))
+    (staging / "shards.json").write_text(json.dumps(state, indent=1), encoding="utf-8")
+    (staging / "manifest.json").write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+
+    numbers = _generation_numbers()
+    generation = GENERATIONS_DIR / f"{(numbers[-1] if numbers else 0) + 1:06d}"
+    os.rename(staging, generation)
+    tmp = CURRENT_PATH.with_name("CURRENT.tmp")
+    tmp.write_text(generation.name, encoding="utf-8")
+    os.replace(tmp, CURRENT_PATH)
+    _resident.invalidate()
+    collect_garbage()
+    return generation
+
+def collect_garbage(grace: float = None) -> int:
+    """Delete superseded generations no reader can still be using, then the shard
+    directories and BM25 segments that none of the remaining ones reference.
+
+    Kept: the newest GENERATIONS_KEEP, any pinned by a query in this process,
+    and any superseded less than `grace` seconds ago (readers in other
+    processes switch within RELOAD_CHECK_INTERVAL; `grace` defaults to
+    GENERATION_GRACE). Returns the number of generations removed.
+    """
+    current = _current_generation()
+    numbers = _generation_numbers()
+    if current is None or not numbers:
+        return 0
+
+    grace = GENERATION_GRACE if grace is None else grace
+    now = time.time()
+    keep = set(numbers[-GENERATIONS_KEEP:]) | _resident.pinned() | {int(current.name)}
+    for older, newer in zip(numbers, numbers[1:]):
+        if now - (GENERATIONS_DIR / f"{newer:06d}").stat().st_mtime < grace:
+            keep.add(older)
+    removed = 0
+    for number in numbers:
+        if number not in keep:
+            shutil.rmtree(GENERATIONS_DIR / f"{number:06d}", ignore_errors=True)
+            removed += 1
+    # Staging directories of builds that died long ago
+    for staging in GENERATIONS_DIR.glob(".staging-*"):
+        if now - staging.stat().st_mtime > 24 * 3600:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    kept = [GENERATIONS_DIR / f"{number:06d}" for number in sorted(keep)]
+    kept = [generation for generation in kept if generation.exists()]
+    live = {entry["dir"] for generation in kept for entry in _load_shard_manifest(generation)["shards"].values()}
+    next_shard = _load_shard_manifest(current)["next"]
+    if SHARDS_DIR.exists():
+        for directory in SHARDS_DIR.iterdir():
+            # Numbers from "next" on may belong to a build still in progress
+            if directory.name not in live and int(directory.suffix[1:]) < next_shard:
+                shutil.rmtree(directory, ignore_errors=True)
+    remove_unused_segments(LEXICAL_DIR, [generation / "lexical.json" for generation in kept
+                                         if (generation / "lexical.json").exists()])
+    return removed
+
+def build_faiss_index(retrain: bool = False, storage: str = None):
+    """Full rebuild: re-embed every summary and transcript and rewrite every shard.
+    Index types are picked per shard from its size; trained IVF parameters from the
+    previous build are reused unless retrain is set or the storage changed.
+    storage ("auto", "fp16", "sq8" or "pq") overrides SEARCH_VECTOR_STORAGE and is
+    kept for later incremental updates and rebuilds."""
+    with _index_writer():
+        _rebuild(retrain, storage)
+
+def _rebuild(retrain: bool, storage: Optional[str]):
+    previous = _load_shard_manifest(_current_generation())
+    storage = storage or os.getenv("SEARCH_VECTOR_STORAGE") or previous.get("storage", "auto")
+    state = {"storage": storage, "dim": previous.get("dim"), "next": previous.get("next", 1), "shards": {}}
+    if not retrain and previous.get("storage") == storage:
+        state["trained_spec"] = previous.get("trained_spec")
+
+    metas, manifest, periods = {}, {}, {}
+    for summ in MEETINGS_DIR.rglob("summary.txt"):
+        try:
+            meta = _read_meeting(summ)
         except (ValueError, IndexError) as e:
             print(f"Skipping invalid file {summ}: {e}")
             continue
+        if meta is None:
+            continue
+
+        metas[meta["label"]] = meta
+        manifest[str(summ)] = _manifest_entry(summ, meta)
+        periods.setdefault(_shard_name(meta), []).append(meta)
 
-    if not docs:
+    if not metas:
         raise RuntimeError("No valid summaries found in meetings directory")
 
-    # Create FAISS index
-    embs = embedder.encode(docs, convert_to_numpy=True)
-    index = faiss.IndexFlatL2(embs.shape[1])
-    index.add(embs)
-    
-    # Save index and metadata
-    faiss.write_index(index, str(INDEX_PATH))
-    with open(META_PATH, "wb") as f:
-        pickle.dump(metas, f)
-
-    print(f"Indexed {len(docs)} meetings with {embs.shape[1]}D embeddings")
-
-def query_faiss(query: str, k: int = 5) -> list[dict]:
-    """Search with date filtering and proper deduplication"""
-    if not INDEX_PATH.exists():
-        raise FileNotFoundError("Index not found - run build_faiss_index() first")
-
-    # Load index and metadata
-    index = faiss.read_index(str(INDEX_PATH))
-    with open(META_PATH, "rb") as f:
-        metas = pickle.load(f)
-
-    # Encode query and search
-    query_emb = embedder.encode([query], convert_to_numpy=True)
-    distances, indices = index.search(query_emb, k)
-
-    # Process results with deduplication
-    seen = set()
+    first_shard, staging = state["next"], None
+    try:
+        for name, meetings in sorted(periods.items()):
+            state["shards"][name] = _build_shard(name, meetings, state)
+
+        staging = _stage()
+        current = _current_generation()
+        if current is not None and (current / "lexical.json").exists():
+            # Carries the segment counter over: older generations still read their segments
+            shutil.copyfile(current / "lexical.json", staging / "lexical.json")
+        LexicalIndex(LEXICAL_DIR, staging / "lexical.json").rebuild(
+            (label, _lexical_text(meta)) for label, meta in metas.items()
+        )
+
+        _publish(staging, state, metas, manifest)
+    except BaseException:
+        _discard(staging, first_shard, state)
+        raise
+    # Single-file indexes from before sharding
+    for legacy in ("faiss.index", "metadata.pkl"):
+        (INDEX_DIR / legacy).unlink(missing_ok=True)
+
+    shards = state["shards"].values()
+    specs = sorted({entry["passage_index"]["spec"] for entry in shards})
+    print(f"Indexed {len(metas)} meetings and {sum(e['passages'] for e in shards)} transcript passages "
+          f"in {len(shards)} shards ({', '.join(specs)}) with {state['dim']}D embeddings")
+    _print_cache_stats()
+
+def update_faiss_index():
+    """Incremental update: only the shards (months) with new, changed or deleted
+    meetings are rebuilt; the embedding cache makes their unchanged meetings cheap"""
+    with _index_writer():
+        _update()
+
+def _update():
+    current = _current_generation()
+    if current is None or not current.exists():
+        return _rebuild(retrain=False, storage=None)
+
+    # Read from the current generation, write a new one: searches keep running meanwhile
+    state = _load_shard_manifest(current)
+    metas = {meta["label"]: meta for meta in MeetingStore(current / "meetings").records()}
+    manifest = json.loads((current / "manifest.json").read_text(encoding="utf-8"))
+
+    seen, stale, added = set(), [], []
+    for summ in MEETINGS_DIR.rglob("summary.txt"):
+        key = str(summ)
+        seen.add(key)
+        entry = manifest.get(key)
+
+        # Cheap check first: untouched files are skipped without reading them
+        if (entry and entry["mtime"] == summ.stat().st_mtime_ns
+                and entry.get("transcript_mtime") == _mtime(_transcript_path(summ))):
+            continue
+
+        try:
+            meta = _read_meeting(summ)
+        except (ValueError, IndexError) as e:
+            print(f"Skipping invalid file {summ}: {e}")
+            meta = None
+        if meta is None:
+            if entry:
+                stale.append(manifest.pop(key)["label"])
+            continue
+
+        new_entry = _manifest_entry(summ, meta)
+        if (entry and entry["sha256"] == new_entry["sha256"]
+                and entry.get("transcript_sha256") == new_entry["transcript_sha256"]):
+            manifest[key] = new_entry  # touched but unchanged
+            continue
+        if entry:
+            stale.append(entry["label"])
+        manifest[key] = new_entry
+        added.append(meta)
+
+    for key in [k for k in manifest if k not in seen]:
+        stale.append(manifest.pop(key)["label"])
+
+    touched = {_shard_name(metas[label]) for label in stale if label in metas}
+    touched |= {_shard_name(meta) for meta in added}
+    drop = set(stale) | {meta["label"] for meta in added}
+    for label in drop:
+        metas.pop(label, None)
+    metas.update((meta["label"], meta) for meta in added)
+    first_shard, staging = state["next"], _stage()
+    try:
+        shutil.copyfile(current / "lexical.json", staging / "lexical.json")
+        if drop:
+            LexicalIndex(LEXICAL_DIR, staging / "lexical.json").update(
+                {meta["label"]: _lexical_text(meta) for meta in added}, drop
+            )
+
+        for name in sorted(touched):
+            state["shards"].pop(name, None)
+            meetings = [meta for meta in metas.values() if _shard_name(meta) == name]
+            for meta in meetings:
+                if "content" not in meta:
+                    meta["content"] = Path(meta["path"]).read_text(encoding="utf-8").strip()
+            if meetings:
+                state["shards"][name] = _build_shard(name, meetings, state)
+
+        _publish(staging, state, metas, manifest)
+    except BaseException:
+        _discard(staging, first_shard, state)
+        raise
+    removed = set(stale) - {meta["label"] for meta in added}
+    print(f"Index updated: {len(added)} added/changed, {len(removed)} removed, "
+          f"{len(touched)} of {len(state['shards'])} shards rebuilt")
+    _print_cache_stats()
+
+class _Shard:
+    """One period's summary index, passage index and passage records"""
+
+    def __init__(self, entry: dict):
+        directory = SHARDS_DIR / entry["dir"]
+        self.dir = entry["dir"]
+        self.index = index_factory.read_index(directory / "faiss.index")
+        self.passage_index = index_factory.read_index(directory / "passages.index")
+        meta_path = directory / "passages.meta"
+        self.passages = (np.memmap(meta_path, dtype=PASSAGE_DTYPE, mode="r")
+                         if meta_path.stat().st_size else np.empty(0, dtype=PASSAGE_DTYPE))
+
+
+class _IndexGeneration:
+    """One version of the shard manifest and metadata. Shards are loaded on first use."""
+
+    def __init__(self, number: int, version: tuple, shards: dict, loaded: dict,
+                 lexical, metas: MeetingStore, load_seconds: float):
+        self.number = number
+        self.version = version
+        self.shards = shards  # name -> shard manifest entry
+        self.loaded = loaded  # name -> _Shard
+        self.lexical = lexical
+        self.metas = metas
+        self.load_seconds = load_seconds
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+        self.queries = 0
+        self.active = 0  # queries in flight; a pinned generation is never garbage-collected
+        self._shard_locks = {name: threading.Lock() for name in shards}
+
+    def shard(self, name: str) -> _Shard:
+        shard = self.loaded.get(name)
+        if shard is None:
+            with self._shard_locks[name]:
+                shard = self.loaded.get(name)
+                if shard is None:
+                    start = time.perf_counter()
+                    shard = self.loaded[name] = _Shard(self.shards[name])
+                    self.load_seconds += time.perf_counter() - start
+        return shard
+
+
+class ResidentIndex:
+    """Long-lived index handle: loads once per process and hot-swaps to newer indexes on disk.
+
+    Queries take a reference to the current generation and keep using it even if
+    a reload swaps in a new one halfway through, so reloads never block searches.
+    A new generation keeps the loaded shards whose directory didn't change.
+    """
+
+    def __init__(self):
+        self._current = None
+        self._history = []
+        self._reload_lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self._last_check = 0.0
+
+    @staticmethod
+    def _disk_version():
+        generation = _current_generation()
+        return int(generation.name) if generation is not None and generation.exists() else None
+
+    def _load(self, version: int) -> _IndexGeneration:
+        start = time.perf_counter()
+        directory = GENERATIONS_DIR / f"{version:06d}"
+        shards = _load_shard_manifest(directory)["shards"]
+        metas = MeetingStore(directory / "meetings")
+        lexical = LexicalIndex(LEXICAL_DIR, directory / "lexical.json")
+        loaded = {}
+        if self._current is not None:
+            loaded = {name: shard for name, shard in self._current.loaded.items()
+                      if name in shards and shards[name]["dir"] == shard.dir}
+        generation = _IndexGeneration(version, version, shards, loaded, lexical,
+                                      metas, time.perf_counter() - start)
+        self._history = (self._history + [generation])[-STATS_HISTORY:]
+        return generation
+
+    def _refresh(self) -> _IndexGeneration:
+        # With an index already loaded, a concurrent reload just means "use what we have"
+        if not self._reload_lock.acquire(blocking=self._current is None):
+            return self._current
+        try:
+            self._last_check = time.monotonic()
+            version = self._disk_version()
+            if version is None:
+                if self._current is None:
+                    raise FileNotFoundError("Index not found - run build_faiss_index() first")
+            elif self._current is None or version != self._current.version:
+                self._current = self._load(version)
+            return self._current
+        finally:
+            self._reload_lock.release()
+
+    def acquire(self) -> _IndexGeneration:
+        """Pin the generation to run one query against; release() it afterwards"""
+        generation = self._current
+        if generation is None or time.monotonic() - self._last_check >= RELOAD_CHECK_INTERVAL:
+            generation = self._refresh()
+        with self._count_lock:
+            generation.queries += 1
+            generation.active += 1
+        return generation
+
+    def release(self, generation: _IndexGeneration):
+        with self._count_lock:
+            generation.active -= 1
+
+    def pinned(self) -> set[int]:
+        """Generation numbers this process is using: the current one and any with queries in flight"""
+        with self._count_lock:
+            pinned = {g.number for g in self._history if g.active}
+        if self._current is not None:
+            pinned.add(self._current.number)
+        return pinned
+
+    def invalidate(self):
+        """Force the next query to check the disk for a newer index"""
+        self._last_check = 0.0
+
+    def stats(self) -> dict:
+        current = self._current
+        return {
+            "current": current.number if current else None,
+            "generations": [
+                {
+                    "generation": g.number,
+                    "loaded_at": g.loaded_at,
+                    "load_seconds": round(g.load_seconds, 4),
+                    "vectors": sum(entry["meetings"] for entry in g.shards.values()),
+                    "passages": sum(entry["passages"] for entry in g.shards.values()),
+                    "shards": len(g.shards),
+                    "shards_loaded": len(g.loaded),
+                    "queries": g.queries,
+                }
+                for g in self._history
+            ],
+        }
+
+
+_resident = ResidentIndex()
+_search_pool = ThreadPoolExecutor(max_workers=SEARCH_THREADS, thread_name_prefix="shard-search")
+
+def index_stats() -> dict:
+    """Load time and queries served for each index generation loaded in this process"""
+    return _resident.stats()
+
+def _passage_text(meta: dict, start: int, end: int) -> str:
+    try:
+        return _transcript_path(meta["path"]).read_text(encoding="utf-8")[start:end].strip()
+    except OSError:
+        return ""
+
+def _date_ints(date_ranges) -> list[tuple[int, int]]:
+    """(start, end) date ranges as YYYYMMDD integer pairs"""
+    as_int = lambda d: d.year * 10000 + d.month * 100 + d.day
+    return [(as_int(start), as_int(end)) for start, end in date_ranges]
+
+def _labels_in_ranges(metas: MeetingStore, ranges) -> np.ndarray:
+    """Labels of meetings whose date falls inside any of the YYYYMMDD (start, end) ranges"""
+    return np.unique(np.concatenate([metas.labels_between(start, end) for start, end in ranges]))
+
+def _search_shard(shard: _Shard, metas: MeetingStore, query_embs: np.ndarray, k: int, nprobe, ef_search,
+                  allowed, allowed_rows) -> list:
+    """For each query row: ranked (label, L2 distance) over one shard's summaries
+    and passages, plus the best passage per meeting"""
+    best = [{} for _ in query_embs]  # meeting label -> best L2 distance over its summary and passages
+    best_passage = [{} for _ in query_embs]
+
+    # Summaries have one vector per meeting; all queries go through one search call
+    if shard.index.ntotal:
+        distances, indices = index_factory.search(shard.index, query_embs, min(k, shard.index.ntotal),
+                                                  nprobe, ef_search, ids=allowed)
+        for q in range(len(query_embs)):
+            for dist, idx in zip(distances[q], indices[q]):
+                if int(idx) in metas:
+                    best[q][int(idx)] = min(float(dist), best[q].get(int(idx), float("inf")))
+
+    # Transcript passages, collapsed to the best passage per meeting. Several
+    # passages can belong to one meeting, so queries that found fewer than k
+    # meetings are searched again with a larger fetch
+    passage_index, passages = shard.passage_index, shard.passages
+    if passage_index.ntotal:
+        candidates = passage_index.ntotal if allowed_rows is None else len(allowed_rows)
+        fetch = k * PASSAGE_OVERFETCH
+        pending = list(range(len(query_embs)))
+        while candidates and pending:
+            distances, indices = index_factory.search(
+                passage_index, query_embs[pending], min(fetch, candidates), nprobe, ef_search,
+                ids=allowed_rows
+            )
+            for q, dists, rows in zip(pending, distances, indices):
+                found = best_passage[q]
+                found.clear()
+                for dist, row in zip(dists, rows):
+                    if not 0 <= row < len(passages):
+                        continue
+                    label = int(passages[row]["meeting"])
+                    if label not in metas or label in found:
+                        continue
+                    found[label] = (float(dist), int(passages[row]["start"]), int(passages[row]["end"]))
+            if fetch >= candidates:
+                break
+            pending = [q for q in pending if len(best_passage[q]) < k]
+            fetch *= 2
+        for q in range(len(query_embs)):
+            for label, (dist, _, _) in best_passage[q].items():
+                best[q][label] = min(dist, best[q].get(label, float("inf")))
+
+    return [(sorted(b.items(), key=itemgetter(1)), p) for b, p in zip(best, best_passage)]
+
+def _vector_search(generation: _IndexGeneration, query_embs: np.ndarray, k: int, nprobe, ef_search,
+                   ranges=(), allowed=None) -> list:
+    """Fan the queries out over the shards overlapping `ranges` (all shards if
+    empty) and merge the per-shard rankings. Shards lying entirely inside a range
+    are searched without an ID selector."""
+    tasks = []
+    for name, entry in generation.shards.items():
+        if ranges and not any(entry["start"] <= end and entry["end"] >= start for start, end in ranges):
+            continue
+        inside = not ranges or any(start <= entry["start"] and entry["end"] <= end for start, end in ranges)
+        tasks.append((name, inside))
+
+    def search(task):
+        name, inside = task
+        shard = generation.shard(name)
+        shard_allowed, allowed_rows = None, None
+        if not inside:
+            shard_allowed = allowed
+            allowed_rows = np.flatnonzero(np.isin(shard.passages["meeting"], allowed)).astype("int64")
+        return _search_shard(shard, generation.metas, query_embs, k, nprobe, ef_search,
+                             shard_allowed, allowed_rows)
+
+    # faiss releases the GIL while searching, so shards run in parallel
+    per_shard = [search(tasks[0])] if len(tasks) == 1 else list(_search_pool.map(search, tasks))
+    results = []
+    for q in range(len(query_embs)):
+        ranked = list(heapq.merge(*(shard[q][0] for shard in per_shard), key=itemgetter(1)))
+        best_passage = {}
+        for shard in per_shard:
+            best_passage.update(shard[q][1])
+        results.append((ranked, best_passage))
+    return results
+
+def _results(metas: MeetingStore, ranked: list, best_passage: dict, k: int) -> list[dict]:
+    # Labels are unique per meeting, so each meeting appears once
     results = []
-    for dist, idx in zip(distances[0], indices[0]):
-        if idx >= len(metas):
+    for label, score in ranked[:k]:
+        entry = metas.get(label, content=True)
+        if entry is None:
             continue
-            
-        entry = metas[idx].copy()
-        entry["score"] = float(dist)
-        
-        # Deduplicate by meeting ID
-        if entry["id"] not in seen:
-            seen.add(entry["id"])
-            results.append(entry)
-            
-        if len(results) >= k:
-            break
+        entry["score"] = score
+        if label in best_passage:
+            dist, start, end = best_passage[label]
+            entry["passage"] = {
+                "start": start,
+                "end": end,
+                "score": dist,
+                "text": _passage_text(entry, start, end),
+            }
+            # Where the passage is in the recording, if the transcript has timestamps
+            times = segments.time_range(segments.load(_transcript_path(entry["path"])), start, end)
+            if times:
+                entry["passage"]["start_ms"], entry["passage"]["end_ms"] = times
+        results.append(entry)
 
     # Sort by date descending
     return sorted(
@@ -104,3 +828,206 @@ def query_faiss(query: str, k: int = 5) -> list[dict]:
         key=lambda x: x["date"],
         reverse=True
     )[:k]
+
+def _search_batch(generation: _IndexGeneration, queries: list[str], k: int, nprobe, ef_search,
+                  date_ranges, mode: str) -> list[list[dict]]:
+    metas = generation.metas
+    query_embs = _query_cache.encode(queries) if mode != "lexical" else None
+
+    # Queries sharing a date filter share one selector and one search call
+    groups = {}
+    for i, ranges in enumerate(date_ranges or [None] * len(queries)):
+        key = tuple(tuple(r) for r in ranges) if ranges else ()
+        groups.setdefault(key, []).append(i)
+
+    out = [[] for _ in queries]
+    for key, members in groups.items():
+        # Date ranges skip shards outside them and become ID selectors inside the
+        # others, so out-of-range vectors are never scored
+        ranges, allowed = [], None
+        if key:
+            ranges = _date_ints(key)
+            allowed = _labels_in_ranges(metas, ranges)
+            if not allowed.size:
+                continue
+
+        vector = [([], {})] * len(members)
+        if mode != "lexical":
+            vector = _vector_search(
+                generation, query_embs[members], k, nprobe, ef_search, ranges, allowed
+            )
+        for i, (vector_ranked, best_passage) in zip(members, vector):
+            lexical_ranked = []
+            if mode != "vector" and generation.lexical is not None:
+                lexical_ranked = generation.lexical.search(
+                    queries[i], 2 * k if mode == "hybrid" else k, allowed
+                )
+
+            if mode == "hybrid":
+                fused = {}
+                for ranked in (vector_ranked, lexical_ranked):
+                    for rank, (label, _) in enumerate(ranked):
+                        fused[label] = fused.get(label, 0.0) + 1.0 / (RRF_K + rank + 1)
+                ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+            else:
+                ranked = vector_ranked if mode == "vector" else lexical_ranked
+            out[i] = _results(metas, ranked, best_passage, k)
+    return out
+
+def query_faiss_batch(queries: list[str], k: int = 5, nprobe: int = None, ef_search: int = None,
+                      date_ranges: list = None, mode: str = None) -> list[list[dict]]:
+    """Search several queries at once: one encoder forward pass for all of them
+    (behind the query embedding LRU) and one index search per distinct date
+    filter. date_ranges, if given, holds one parse_query() range list per query.
+    Returns one result list per query, as query_faiss() would."""
+    mode = mode or SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+    if not queries:
+        return []
+
+    # Pin the resident generation for the whole batch
+    generation = _resident.acquire()
+    try:
+        return _search_batch(generation, queries, k, nprobe, ef_search, date_ranges, mode)
+    finally:
+        _resident.release(generation)
+
+def query_faiss(query: str, k: int = 5, nprobe: int = None, ef_search: int = None,
+                date_ranges=None, mode: str = None) -> list[dict]:
+    """Search meetings, one result per meeting.
+
+    mode is "vector" (summaries and transcript passages, score = L2 distance),
+    "lexical" (BM25 over summary + transcript, score = BM25; never loads the
+    embedding model) or "hybrid" (both merged by reciprocal rank fusion, score =
+    fused RRF score). Defaults to SEARCH_MODE.
+    nprobe / ef_search tune IVF and HNSW indexes for this query only.
+    date_ranges (as returned by query_parser.parse_query) restrict the search
+    itself to meetings inside those dates.
+    """
+    return query_faiss_batch([query], k, nprobe, ef_search, [date_ranges], mode)[0]
+
+
+class QueryBatcher:
+    """Coalesces concurrent async searches (e.g. several Telegram messages
+    arriving together) into query_faiss_batch calls run off the event loop.
+    A batch is sent when max_batch requests are waiting or max_wait seconds
+    after the first one arrived."""
+
+    def __init__(self, max_batch: int = 16, max_wait: float = 0.02):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+        self._tasks = set()  # the loop only keeps weak references to running tasks
+
+    async def search(self, query: str, k: int = 5, date_ranges=None, mode: str = None,
+                     nprobe: int = None, ef_search: int = None) -> list[dict]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, date_ranges, (k, nprobe, ef_search, mode), future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+
+        # Only requests with the same k / tuning / mode can share a batch call
+        batches = {}
+        for request in pending:
+            batches.setdefault(request[2], []).append(request)
+        for options, requests in batches.items():
+            task = asyncio.ensure_future(self._run(options, requests))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, options, requests):
+        k, nprobe, ef_search, mode = options
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                None, query_faiss_batch, [r[0] for r in requests], k, nprobe, ef_search,
+                [r[1] for r in requests], mode
+            )
+        except Exception as e:
+            for request in requests:
+                if not request[3].done():
+                    request[3].set_exception(e)
+            return
+        for request, result in zip(requests, results):
+            if not request[3].done():
+                request[3].set_result(result)
+
+
+def _passage_vectors() -> np.ndarray:
+    """All indexed passage vectors, re-read through the embedding cache"""
+    batches, texts = [], []
+    for meta in MeetingStore(_current_generation() / "meetings").records():
+        transcript = _transcript_path(meta["path"])
+        if not transcript.exists():
+            continue
+        text = transcript.read_text(encoding="utf-8")
+        texts.extend(text[start:end] for start, end in _passage_spans(text))
+        if len(texts) >= PASSAGE_BATCH:
+            batches.append(_encode(texts))
+            texts = []
+    if texts:
+        batches.append(_encode(texts))
+    return np.concatenate(batches)
+
+def recall_report(k: int = 10, queries: int = 200) -> list[dict]:
+    """Recall@k vs. latency of each index type over the current passages, against exact search"""
+    vectors = _passage_vectors()
+    rng = np.random.default_rng(0)
+    held_out = rng.choice(len(vectors), size=min(queries, len(vectors) // 10 or 1), replace=False)
+    mask = np.ones(len(vectors), dtype=bool)
+    mask[held_out] = False
+    return index_factory.recall_report(vectors[mask], vectors[held_out], k)
+
+def storage_report(k: int = 10, queries: int = 200) -> list[dict]:
+    """Disk size, RSS and recall@k of each vector storage option over the current passages"""
+    vectors = _passage_vectors()
+    rng = np.random.default_rng(0)
+    held_out = rng.choice(len(vectors), size=min(queries, len(vectors) // 10 or 1), replace=False)
+    mask = np.ones(len(vectors), dtype=bool)
+    mask[held_out] = False
+    return index_factory.storage_report(vectors[mask], vectors[held_out], k)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the meeting search index")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="re-embed every summary instead of only new or changed ones")
+    parser.add_argument("--retrain", action="store_true",
+                        help="with --rebuild, retrain IVF/PQ parameters instead of reusing them")
+    parser.add_argument("--report", action="store_true",
+                        help="print recall@k and latency of Flat/HNSW/IVF-PQ on the current passages")
+    parser.add_argument("--storage", choices=index_factory.STORAGE_OPTIONS,
+                        help="with --rebuild, store vectors as float32 (auto), fp16, sq8 or pq codes")
+    parser.add_argument("--storage-report", action="store_true",
+                        help="print disk size, RSS and recall@k of each storage option on the current passages")
+    parser.add_argument("-k", type=int, default=10, help="k for --report / --storage-report")
+    args = parser.parse_args()
+    if args.storage_report:
+        mb = 1024 * 1024
+        for row in storage_report(args.k):
+            print(f"{row['storage']:<6} {row['spec']:<16} disk={row['disk_bytes'] / mb:.1f}MB "
+                  f"rss={row['rss_bytes'] / mb:.1f}MB mmap_rss={row['mmap_rss_bytes'] / mb:.1f}MB "
+                  f"(private {row['mmap_private_bytes'] / mb:.1f}MB) "
+                  f"recall@{args.k}={row['recall']:.3f} {row['ms_per_query']:.3f} ms/query")
+    elif args.report:
+        for row in recall_report(args.k):
+            print(f"{row['spec']:<16} {row['setting']:<14} recall@{args.k}={row['recall']:.3f} "
+                  f"{row['ms_per_query']:.3f} ms/query{'  <- chosen' if row['chosen'] else ''}")
+    elif args.rebuild:
+        build_faiss_index(retrain=args.retrain, storage=args.storage)
+    else:
+        update_faiss_index()
@@ -0,0 +1,79 @@
+# modules/segments.py
+import os
+import json
+import tempfile
+from pathlib import Path
+from typing import Optional
+import numpy as np
+
+MEETINGS_DIR = Path("meetings")
+SEGMENTS_FILE = "segments.npy"
+# One record per whisper segment: times in ms, and where its text sits in
+# transcript.txt as character offsets (the same units as search passages)
+SEGMENT_DTYPE = np.dtype([("start", "<u4"), ("end", "<u4"), ("offset", "<u4"), ("length", "<u4")])
+
+def segments_path(transcript: Path) -> Path:
+    return Path(transcript).with_name(SEGMENTS_FILE)
+
+def _timestamped(transcript: Path) -> list[dict]:
+    """Segments of the whisper -oj JSON next to a transcript (start/end in ms, text)"""
+    data = json.loads(Path(transcript).with_suffix(".json").read_text(encoding="utf-8"))
+    return [
+        {"start": seg["offsets"]["from"], "end": seg["offsets"]["to"], "text": seg["text"]}
+        for seg in data.get("transcription", [])
+    ]
+
+def write(transcript: Path, segments: list[dict] = None) -> Path:
+    """Write the segment file of a transcript, from `segments` or its transcript.json"""
+    transcript = Path(transcript)
+    if segments is None:
+        segments = _timestamped(transcript)
+    text = transcript.read_text(encoding="utf-8")
+    records, cursor = [], 0
+    for seg in segments:
+        words = seg["text"].strip()
+        found = text.find(words, cursor) if words else -1
+        offset = found if found >= 0 else cursor  # text not found verbatim: keep the order
+        records.append((seg["start"], seg["end"], offset, len(words) if found >= 0 else 0))
+        cursor = offset + records[-1][3]
+
+    path = segments_path(transcript)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".segments-", suffix=".npy")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, np.array(records, dtype=SEGMENT_DTYPE))
+    os.replace(tmp, path)
+    return path
+
+def load(transcript: Path) -> Optional[np.ndarray]:
+    """Memory-mapped segment records of a transcript, or None if it has none"""
+    try:
+        return np.load(segments_path(transcript), mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+def time_range(segments: np.ndarray, start: int, end: int) -> Optional[tuple[int, int]]:
+    """(start ms, end ms) of the segments covering characters [start, end) of the transcript"""
+    if segments is None or not len(segments):
+        return None
+    offsets = segments["offset"]
+    first = max(int(np.searchsorted(offsets, start, side="right")) - 1, 0)
+    last = max(int(np.searchsorted(offsets, max(end - 1, start), side="right")) - 1, first)
+    return int(segments[first]["start"]), int(segments[last]["end"])
+
+def format_time(ms: int) -> str:
+    """HH:MM:SS"""
+    hours, rest = divmod(int(ms) // 1000, 3600)
+    return f"{hours:02d}:{rest // 60:02d}:{rest % 60:02d}"
+
+def backfill(root: Path = MEETINGS_DIR) -> int:
+    """Write segment files for transcripts that have timestamps but no segment file"""
+    written = 0
+    for transcript in Path(root).rglob("transcript.txt"):
+        if transcript.with_suffix(".json").exists() and not segments_path(transcript).exists():
+            write(transcript)
+            written += 1
+    return written
+
+
+if __name__ == "__main__":
+    print(f"Wrote {backfill()} segment files")
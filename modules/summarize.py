@@ -1,29 +1,262 @@
 # modules/summarize.py
+import os
+import json
+import time
+import queue
+import shutil
+import platform
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import Future
 from transformers import pipeline
 from pathlib import Path
 import logging
+from modules.disk_cache import DiskCache, CACHE_DIR
+
+SUMMARY_MODEL = "sshleifer/distilbart-cnn-12-6"
+# Transcripts are summarized in token-bounded chunks, then the chunk summaries are
+# summarized again (repeatedly for very long meetings) until one chunk remains
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "900"))  # distilbart reads at most 1024
+CHUNK_OVERLAP = int(os.getenv("SUMMARY_CHUNK_OVERLAP", "100"))  # tokens shared by neighbouring chunks
+BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "4"))  # most chunks per pipeline call
+# How long the worker waits for more chunks (from any caller) before running a partial batch
+MAX_WAIT = float(os.getenv("SUMMARY_MAX_WAIT", "0.05"))
+CHUNK_SUMMARY_LENGTH = (20, 120)  # (min, max) tokens per chunk summary
+SUMMARY_LENGTH = (30, 150)  # (min, max) tokens of the final summary
+# Whole-transcript and per-chunk summaries, so unchanged text is never generated twice
+SUMMARY_CACHE_DIR = Path(os.getenv("SUMMARY_CACHE_DIR", CACHE_DIR / "summaries"))
+SUMMARY_CACHE_MB = int(os.getenv("SUMMARY_CACHE_MB", "256"))  # 0 = no limit
+
+summary_cache = DiskCache(SUMMARY_CACHE_DIR, SUMMARY_CACHE_MB * 1024 * 1024)
+
+# "pytorch" (default, fp32) or "onnx": the model exported to ONNX with int8 dynamic
+# quantization, run by ONNX Runtime (needs `pip install optimum[onnxruntime]`)
+SUMMARY_BACKEND = os.getenv("SUMMARY_BACKEND", "pytorch")
+ONNX_DIR = Path(os.getenv("SUMMARY_ONNX_DIR", Path("models") / "onnx" / f"{SUMMARY_MODEL.split('/')[-1]}-int8"))
+
+def _quantization_config():
+    """Dynamic int8 quantization for the instruction set of this CPU"""
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    flags = Path("/proc/cpuinfo").read_text() if Path("/proc/cpuinfo").exists() else ""
+    if "avx512_vnni" in flags:
+        return AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    return AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+
+def export_onnx(output_dir: Path = ONNX_DIR) -> Path:
+    """Export SUMMARY_MODEL to ONNX and write an int8 dynamically quantized copy
+    of each of its graphs (encoder, decoder, decoder with past) to output_dir"""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+    from transformers import AutoTokenizer
+
+    output_dir = Path(output_dir)
+    with tempfile.TemporaryDirectory(prefix="onnx-export-") as tmp:
+        ORTModelForSeq2SeqLM.from_pretrained(SUMMARY_MODEL, export=True).save_pretrained(tmp)
+        config = _quantization_config()
+        for graph in sorted(Path(tmp).glob("*.onnx")):
+            quantizer = ORTQuantizer.from_pretrained(tmp, file_name=graph.name)
+            quantizer.quantize(save_dir=output_dir, quantization_config=config)
+        for name in ("config.json", "generation_config.json"):
+            if (Path(tmp) / name).exists():
+                shutil.copyfile(Path(tmp) / name, output_dir / name)
+    AutoTokenizer.from_pretrained(SUMMARY_MODEL).save_pretrained(output_dir)
+    print(f"Quantized ONNX model written to {output_dir}")
+    return output_dir
+
+def load_summarizer(backend: str = SUMMARY_BACKEND):
+    """The summarization pipeline of the configured backend (exports the ONNX
+    model on first use)"""
+    if backend == "pytorch":
+        return pipeline("summarization", model=SUMMARY_MODEL, tokenizer=SUMMARY_MODEL)
+    if backend != "onnx":
+        raise ValueError(f"Unknown SUMMARY_BACKEND {backend!r} (pytorch or onnx)")
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer
+
+    if not any(ONNX_DIR.glob("*_quantized.onnx")):
+        export_onnx(ONNX_DIR)
+    graphs = {g.name.replace("_model_quantized.onnx", ""): g.name for g in ONNX_DIR.glob("*_model_quantized.onnx")}
+    model = ORTModelForSeq2SeqLM.from_pretrained(
+        ONNX_DIR,
+        encoder_file_name=graphs["encoder"],
+        decoder_file_name=graphs["decoder"],
+        decoder_with_past_file_name=graphs.get("decoder_with_past"),
+    )
+    return pipeline("summarization", model=model, tokenizer=AutoTokenizer.from_pretrained(ONNX_DIR))
 
 # Load model once at startup
-SUMMARIZER = pipeline(
-    "summarization",
-    model="sshleifer/distilbart-cnn-12-6",
-    tokenizer="sshleifer/distilbart-cnn-12-6"
-)
+SUMMARIZER = load_summarizer()
+
+def chunk_text(text: str, tokenizer=None, chunk_tokens: int = CHUNK_TOKENS,
+               overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """Split text into windows of at most chunk_tokens model tokens, overlapping
+    by `overlap` tokens; each window is a slice of the original text"""
+    tokenizer = tokenizer or SUMMARIZER.tokenizer
+    encoded = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    spans = encoded["offset_mapping"]
+    if len(spans) <= chunk_tokens:
+        return [text] if text.strip() else []
+    step = max(chunk_tokens - overlap, 1)
+    chunks = []
+    for first in range(0, len(spans), step):
+        window = spans[first:first + chunk_tokens]
+        chunks.append(text[window[0][0]:window[-1][1]])
+        if first + chunk_tokens >= len(spans):
+            break
+    return chunks
+
+def _summarize_batch(texts: list[str], length: tuple[int, int]) -> list[str]:
+    min_length, max_length = length
+    results = SUMMARIZER(
+        texts,
+        batch_size=len(texts),
+        max_length=max_length,
+        min_length=min_length,
+        do_sample=False,
+        truncation=True,
+    )
+    return [r["summary_text"].strip() for r in results]
+
+class SummaryWorker:
+    """Runs every summarization in this process through one background thread.
+
+    Callers on any thread submit chunks and block on futures; the worker takes
+    up to max_batch waiting chunks (waiting at most max_wait after the first
+    for others to arrive), runs them as one batched pipeline call and hands
+    each caller its result. Chunks of concurrent uploads thus share forward
+    passes instead of running one after another.
+    """
+
+    def __init__(self, max_batch: int = BATCH_SIZE, max_wait: float = MAX_WAIT):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batch_sizes = Counter()
+        self.max_queue_depth = 0
+        self.failures = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="summary-worker", daemon=True)
+                self._thread.start()
+
+    def submit(self, text: str, length: tuple[int, int] = SUMMARY_LENGTH) -> Future:
+        """Queue one text; the future resolves to its summary"""
+        self._start()
+        future = Future()
+        self._queue.put((text, tuple(length), future))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def summarize(self, texts: list[str], length: tuple[int, int] = SUMMARY_LENGTH) -> list[str]:
+        """Summaries of texts, in order, computed in whatever batches they land in"""
+        futures = [self.submit(text, length) for text in texts]
+        return [future.result() for future in futures]
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            # Only chunks with the same generation lengths can share a pipeline call
+            groups = {}
+            for request in self._next_batch():
+                groups.setdefault(request[1], []).append(request)
+            for length, requests in groups.items():
+                self.batch_sizes[len(requests)] += 1
+                try:
+                    results = _summarize_batch([r[0] for r in requests], length)
+                except Exception as e:
+                    self.failures += 1
+                    for request in requests:
+                        request[2].set_exception(e)
+                    continue
+                for request, result in zip(requests, results):
+                    request[2].set_result(result)
+
+    def stats(self) -> dict:
+        batches = sum(self.batch_sizes.values())
+        items = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "batches": batches,
+            "chunks": items,
+            "mean_batch": round(items / batches, 2) if batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "failures": self.failures,
+        }
+
+summary_worker = SummaryWorker()
+
+def summary_stats() -> dict:
+    """Queue depth and batch-size histogram of this process's summarization worker,
+    and its summary cache hits"""
+    return dict(summary_worker.stats(), cache_hits=summary_cache.hits, cache_misses=summary_cache.misses)
+
+def _cache_key(kind: str, text: str, **settings) -> str:
+    """sha256 over the text and everything that changes what the model generates for it"""
+    key = {"kind": kind, "model": SUMMARY_MODEL, "backend": SUMMARY_BACKEND,
+           "text": hashlib.sha256(text.encode("utf-8")).hexdigest()}
+    return hashlib.sha256(json.dumps(dict(key, **settings), sort_keys=True).encode("utf-8")).hexdigest()
+
+def _summaries(chunks: list[str], length: tuple[int, int]) -> list[str]:
+    """Summaries of chunks, generating only those not cached yet. A transcript
+    that only grew at the end keeps its earlier chunks, so just the new tail
+    (and the reduce step) is summarized again."""
+    keys = [_cache_key("chunk", chunk, length=list(length)) for chunk in chunks]
+    found = [summary_cache.get_text(key, "summary.txt") for key in keys]
+    missing = [i for i, summary in enumerate(found) if summary is None]
+    if missing:
+        for i, summary in zip(missing, summary_worker.summarize([chunks[i] for i in missing], length)):
+            summary_cache.put_text(keys[i], "summary.txt", summary)
+            found[i] = summary
+    return found
+
+def summarize_text(text: str) -> str:
+    """Summary of a whole transcript: map over token-bounded chunks, then reduce
+    the chunk summaries until they fit in one chunk"""
+    key = _cache_key("transcript", text, length=list(SUMMARY_LENGTH), chunk_length=list(CHUNK_SUMMARY_LENGTH),
+                     chunk_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP)
+    cached = summary_cache.get_text(key, "summary.txt")
+    if cached is not None:
+        return cached
+
+    chunks = chunk_text(text)
+    if not chunks:
+        return ""
+    level = 0
+    while len(chunks) > 1:
+        level += 1
+        logging.info(f"Summarizing {len(chunks)} chunks (level {level})")
+        partial = _summaries(chunks, CHUNK_SUMMARY_LENGTH)
+        reduced = chunk_text("\n".join(partial))
+        # Chunks too small for summaries to shrink them (a tiny SUMMARY_CHUNK_TOKENS)
+        # would never converge; the final pass truncates instead
+        chunks = reduced if len(reduced) < len(chunks) else ["\n".join(partial)]
+    summary = _summaries(chunks, SUMMARY_LENGTH)[0]
+    summary_cache.put_text(key, "summary.txt", summary)
+    return summary
 
-    
 def summarize(transcript_path: str, summary_path: str):
     try:
         transcript = Path(transcript_path).read_text(encoding="utf-8")
-        
-        # Truncate to model's max input length (1024 tokens)
-        truncated = transcript[:3000]  # ~500 words
-        
-        summary = SUMMARIZER(
-            truncated,
-            max_length=150,
-            min_length=30,
-            do_sample=False
-        )[0]['summary_text']
+
+        summary = summarize_text(transcript)
 
         Path(summary_path).parent.mkdir(parents=True, exist_ok=True)
         Path(summary_path).write_text(summary, encoding="utf-8")
@@ -31,4 +264,21 @@ def summarize(transcript_path: str, summary_path: str):
 
     except Exception as e:
         logging.error(f"Summarization failed: {e}")
-        raise RuntimeError(f"Summarization error: {e}")
\ No newline at end of file
+        raise RuntimeError(f"Summarization error: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize a transcript")
+    parser.add_argument("transcript", nargs="?", type=Path, help="transcript.txt to summarize")
+    parser.add_argument("summary", nargs="?", type=Path, help="where to write the summary (default: print)")
+    parser.add_argument("--export-onnx", action="store_true", help="export and quantize the model for SUMMARY_BACKEND=onnx")
+    args = parser.parse_args()
+
+    if args.export_onnx:
+        export_onnx()
+    if args.transcript and args.summary:
+        summarize(str(args.transcript), str(args.summary))
+    elif args.transcript:
+        print(summarize_text(args.transcript.read_text(encoding="utf-8")))
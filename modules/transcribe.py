@@ -1,32 +1,321 @@
 # modules/transcribe.py
 
+import os
+import re
+import json
+import shutil
+import logging
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def transcribe(input_file: str, output_file: str) -> None:
+from modules import whisper_server, segments as segment_file
+
+WHISPER_CLI = Path(os.getenv("WHISPER_CLI", Path("whisper.cpp") / "build" / "bin" / "Release" / "whisper-cli.exe"))
+WHISPER_MODEL = Path(os.getenv("WHISPER_MODEL_PATH", Path("models") / "ggml-base.en.bin"))
+FFMPEG = os.getenv("FFMPEG", "ffmpeg")
+FFPROBE = os.getenv("FFPROBE", "ffprobe")
+# Recordings at least this long are split at silences and transcribed in parallel
+PARALLEL_MIN_SECONDS = float(os.getenv("TRANSCRIBE_PARALLEL_MIN_SECONDS", "600"))
+CHUNK_SECONDS = 300  # target chunk length; cuts move to the nearest silence
+CHUNK_SEARCH_SECONDS = 60  # how far from the target a silence may be
+# A whisper-server answers once per request: when progress is wanted, shorter files
+# are sent to it in chunks of about this length, so each chunk reports back
+PROGRESS_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_PROGRESS_CHUNK_SECONDS", "30"))
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_SECONDS = 0.5
+THREADS_PER_WORKER = 4  # whisper.cpp scales well up to about this many threads per process
+MAX_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "0"))  # 0 = from the number of cores
+# Chunk plan and finished chunks of a chunked transcription, next to its output;
+# an interrupted run resumes from here and the folder is removed once done
+CHECKPOINT_DIR = ".transcribe"
+
+def _duration(path: Path) -> float:
+    """Length of a media file in seconds"""
+    result = subprocess.run(
+        [FFPROBE, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+        capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip())
+
+def _silences(path: Path) -> list[tuple[float, float]]:
+    """(start, end) seconds of every silence ffmpeg's silencedetect finds"""
+    result = subprocess.run(
+        [FFMPEG, "-hide_banner", "-nostats", "-i", str(path),
+         "-af", f"silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_SECONDS}", "-f", "null", "-"],
+        capture_output=True, text=True, check=True,
+    )
+    starts = [float(s) for s in re.findall(r"silence_start: (-?[\d.]+)", result.stderr)]
+    ends = [float(s) for s in re.findall(r"silence_end: ([\d.]+)", result.stderr)]
+    return list(zip(starts, ends))
+
+def plan_chunks(duration: float, silences, target: float = CHUNK_SECONDS) -> list[tuple[float, float]]:
+    """Split [0, duration] into ~target-second chunks, cutting in the middle of the
+    silence closest to each target boundary (or at the boundary if there is none)"""
+    cuts, position = [], 0.0
+    midpoints = [(start + end) / 2 for start, end in silences]
+    while duration - position > target * 1.5:
+        wanted = position + target
+        near = [m for m in midpoints if abs(m - wanted) <= CHUNK_SEARCH_SECONDS and m > position]
+        position = min(near, key=lambda m: abs(m - wanted)) if near else wanted
+        cuts.append(position)
+    bounds = [0.0] + cuts + [duration]
+    return list(zip(bounds, bounds[1:]))
+
+def worker_plan(chunks: int) -> tuple[int, int]:
+    """(parallel whisper processes, threads each) for the cores of this machine"""
+    cores = os.cpu_count() or 1
+    workers = max(1, min(chunks, cores // THREADS_PER_WORKER or 1))
+    if MAX_WORKERS:
+        workers = min(workers, MAX_WORKERS)
+    return workers, max(1, cores // workers)
+
+def clip_audio(media: Path, start_ms: int, end_ms: int, out: Path) -> Path:
+    """Cut [start_ms, end_ms] of a recording's audio into an Ogg/Opus file"""
+    subprocess.run(
+        [FFMPEG, "-hide_banner", "-loglevel", "error", "-y", "-ss", f"{start_ms / 1000:.3f}",
+         "-t", f"{(end_ms - start_ms) / 1000:.3f}", "-i", str(media), "-vn", "-ac", "1",
+         "-c:a", "libopus", "-b:a", "32k", str(out)],
+        check=True,
+    )
+    return out
+
+def _timestamp(ms: int) -> str:
+    hours, rest = divmod(int(ms), 3_600_000)
+    minutes, rest = divmod(rest, 60_000)
+    seconds, millis = divmod(rest, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{millis:03d}"
+
+def _run_whisper(audio: Path, base_out: Path, threads: int = None, extra=("-otxt",)):
+    cmd = [str(WHISPER_CLI), "--model", str(WHISPER_MODEL), "-of", str(base_out)]
+    if threads:
+        cmd += ["-t", str(threads)]
+    subprocess.run(cmd + list(extra) + [str(audio)], check=True)
+
+def _server_pool():
+    """Persistent whisper-server pool, or None to spawn whisper-cli per file"""
+    return whisper_server.get_pool(WHISPER_MODEL, convert=bool(shutil.which(FFMPEG)))
+
+def _whisper_segments(audio: Path, base_out: Path, threads: int = None) -> list[dict]:
+    """Segments (start/end in ms, text) of one file, from a whisper-server when one
+    is running and from a whisper-cli process otherwise"""
+    pool = _server_pool()
+    if pool is not None:
+        try:
+            return pool.transcribe(audio)
+        except (OSError, ValueError) as e:
+            logging.warning(f"whisper-server failed on {audio.name} ({e}); falling back to whisper-cli")
+    _run_whisper(audio, base_out, threads, extra=("-oj",))
+    data = json.loads(base_out.with_suffix(".json").read_text(encoding="utf-8"))
+    return [
+        {"start": seg["offsets"]["from"], "end": seg["offsets"]["to"], "text": seg["text"]}
+        for seg in data.get("transcription", [])
+    ]
+
+def _write_transcript(out: Path, segments: list[dict]):
+    """Write `out` (one segment per line, like whisper's -otxt), whisper -oj style
+    JSON and SRT next to it, and the segment file search uses for timestamps"""
+    out.write_text("\n".join(seg["text"].strip() for seg in segments) + "\n", encoding="utf-8")
+    out.with_suffix(".json").write_text(json.dumps({"transcription": [
+        {
+            "timestamps": {"from": _timestamp(seg["start"]), "to": _timestamp(seg["end"])},
+            "offsets": {"from": seg["start"], "to": seg["end"]},
+            "text": seg["text"],
+        }
+        for seg in segments
+    ]}, indent=1), encoding="utf-8")
+    out.with_suffix(".srt").write_text("".join(
+        f"{i}\n{_timestamp(seg['start'])} --> {_timestamp(seg['end'])}\n{seg['text'].strip()}\n\n"
+        for i, seg in enumerate(segments, 1)
+    ), encoding="utf-8")
+    segment_file.write(out, segments)
+
+def _write_json(path: Path, data):
+    """Write JSON through a temporary file, so a crash never leaves half a checkpoint"""
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, path)
+
+def _transcribe_chunk(inp: Path, start: float, end: float, workdir: Path, number: int, threads: int) -> list[dict]:
+    """Cut one chunk to 16 kHz mono WAV, transcribe it and return its segments
+    with offsets relative to the start of the recording; they are also saved as
+    the chunk's checkpoint"""
+    base_out = workdir / f"chunk-{number:04d}"
+    wav = base_out.with_suffix(".wav")
+    subprocess.run(
+        [FFMPEG, "-hide_banner", "-loglevel", "error", "-y", "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}",
+         "-i", str(inp), "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le", str(wav)],
+        check=True,
+    )
+    shift = int(start * 1000)
+    segments = [
+        {"start": seg["start"] + shift, "end": seg["end"] + shift, "text": seg["text"]}
+        for seg in _whisper_segments(wav, base_out, threads)
+    ]
+    _write_json(base_out.with_suffix(".done"), segments)
+    wav.unlink(missing_ok=True)
+    base_out.with_suffix(".json").unlink(missing_ok=True)
+    return segments
+
+def _chunk_plan(inp: Path, duration: float, workdir: Path, digest: str = None,
+                target: float = CHUNK_SECONDS) -> list[tuple[float, float]]:
+    """The chunks of an interrupted run of the same input, or a new plan (which
+    discards checkpoints of anything else). `digest` (the media hash) tells a
+    different recording at the same path and size apart; without it the file's
+    mtime does."""
+    stat = inp.stat()
+    source = {"input": str(inp), "size": stat.st_size}
+    source.update({"digest": digest} if digest else {"mtime_ns": stat.st_mtime_ns})
+    plan_path = workdir / "plan.json"
+    try:
+        plan = json.loads(plan_path.read_text(encoding="utf-8"))
+        if plan["source"] == source:
+            return [tuple(chunk) for chunk in plan["chunks"]]
+    except (OSError, ValueError, KeyError):
+        pass
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir(parents=True)
+    chunks = plan_chunks(duration, _silences(inp), target)
+    _write_json(plan_path, {"source": source, "duration": duration, "chunks": chunks})
+    return chunks
+
+def _parallel_segments(inp: Path, duration: float, workdir: Path, digest: str = None,
+                       target: float = CHUNK_SECONDS):
+    """Split at silences and transcribe chunks concurrently, skipping chunks
+    already checkpointed in workdir; yields each chunk's segments (relative to
+    the whole recording) in order, with the chunk's end second"""
+    chunks = _chunk_plan(inp, duration, workdir, digest, target)
+    done = {}
+    for i in range(len(chunks)):
+        checkpoint = workdir / f"chunk-{i:04d}.done"
+        if checkpoint.exists():
+            done[i] = json.loads(checkpoint.read_text(encoding="utf-8"))
+    if done:
+        print(f"Resuming: {len(done)} of {len(chunks)} chunks already transcribed")
+    todo = len(chunks) - len(done)
+
+    pool = _server_pool()
+    if pool is not None:
+        # One job in flight per server; the servers already split the cores
+        workers, threads = max(1, min(todo, len(pool.urls))), None
+        print(f"Transcribing {todo} chunks on {len(pool.urls)} whisper-server(s)")
+    else:
+        workers, threads = worker_plan(max(todo, 1))
+        print(f"Transcribing {todo} chunks with {workers} workers x {threads} threads")
+
+    # Each worker thread just waits on a whisper process or server, so threads suffice
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            i: pool.submit(_transcribe_chunk, inp, start, end, workdir, i, threads)
+            for i, (start, end) in enumerate(chunks) if i not in done
+        }
+        for i, (start, end) in enumerate(chunks):
+            yield (done[i] if i in done else futures[i].result()), end
+
+def transcribe_parallel(inp: Path, out: Path, digest: str = None) -> list[dict]:
+    """Split at silences, transcribe chunks concurrently and stitch them in order.
+
+    Writes `out` (one segment per line, like whisper's -otxt) and a whisper
+    -oj style JSON next to it with timestamps relative to the whole recording,
+    only once every chunk is done; finished chunks are checkpointed in
+    CHECKPOINT_DIR next to `out`, so a rerun after a crash picks up from there.
+    Returns the segments as dicts with start/end in milliseconds and text.
+    """
+    workdir = out.parent / CHECKPOINT_DIR
+    segments = [seg for chunk, _ in _parallel_segments(inp, _duration(inp), workdir, digest) for seg in chunk]
+    _write_transcript(out, segments)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return segments
+
+_SEGMENT_LINE = re.compile(r"^\[(\d+):(\d+):(\d+)\.(\d+) --> (\d+):(\d+):(\d+)\.(\d+)\]\s*(.*)$")
+
+def _stream_whisper(audio: Path, base_out: Path, threads: int = None, extra=("-otxt",)):
+    """Run whisper-cli like _run_whisper, yielding the segments it prints as it goes"""
+    cmd = [str(WHISPER_CLI), "--model", str(WHISPER_MODEL), "-of", str(base_out)]
+    if threads:
+        cmd += ["-t", str(threads)]
+    with subprocess.Popen(cmd + list(extra) + [str(audio)], stdout=subprocess.PIPE,
+                          text=True, encoding="utf-8", errors="replace") as process:
+        for line in process.stdout:
+            match = _SEGMENT_LINE.match(line.strip())
+            if match:
+                h1, m1, s1, ms1, h2, m2, s2, ms2 = (int(g) for g in match.groups()[:8])
+                yield {
+                    "start": ((h1 * 60 + m1) * 60 + s1) * 1000 + ms1,
+                    "end": ((h2 * 60 + m2) * 60 + s2) * 1000 + ms2,
+                    "text": match.group(9),
+                }
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, cmd)
+
+def transcribe_stream(input_file: str, output_file: str, parallel: bool = None, digest: str = None,
+                      progress: bool = True):
+    """Transcribe like transcribe(), yielding progress while whisper runs.
+
+    Each item is {"segments": [...], "progress": p}: the segments finished
+    since the previous item (start/end in ms, text) and the fraction of the
+    recording done (None when the duration is unknown). The output files are
+    complete once the generator is exhausted. `digest` identifies the recording
+    (its media hash) when resuming chunk checkpoints.
+
+    With a whisper-server pool, shorter files are sent in PROGRESS_CHUNK_SECONDS
+    chunks (or to a streaming whisper-cli without ffmpeg) so items keep coming;
+    progress=False sends them whole, for callers that only want the result.
+    """
     inp = Path(input_file).resolve()  # Convert to absolute path
     out = Path(output_file).resolve()
 
     # Ensure output directory exists
     out.parent.mkdir(parents=True, exist_ok=True)
 
-# Remove .txt suffix for -of flag
-    base_out = out.parent / out.stem  # e.g., "transcript" instead of "transcript.txt"
-
-# Build whisper.cpp command
-    whisper_cli = Path("whisper.cpp") / "build" / "bin" / "Release" / "whisper-cli.exe"
-    model_bin = Path("models") / "ggml-base.en.bin"
-
-    cmd = [
-    str(whisper_cli),
-    "--model", str(model_bin),
-    "-of", str(base_out),  # Generates base_out.txt
-    "-otxt",
-    str(inp)
-          ]
-    subprocess.run(cmd, check=True)
-
+    has_ffmpeg = bool(shutil.which(FFMPEG) and shutil.which(FFPROBE))
+    duration = _duration(inp) if has_ffmpeg or parallel else None
+    workdir = out.parent / CHECKPOINT_DIR
+    if parallel is None:
+        # An interrupted chunked run is always resumed as one
+        parallel = has_ffmpeg and (duration >= PARALLEL_MIN_SECONDS or (workdir / "plan.json").exists())
+    pool = None if parallel else _server_pool()
+    target = CHUNK_SECONDS
+    if pool is not None and progress:
+        if has_ffmpeg and duration > PROGRESS_CHUNK_SECONDS * 1.5:
+            parallel, target = True, PROGRESS_CHUNK_SECONDS
+        elif not has_ffmpeg and WHISPER_CLI.exists():
+            pool = None
+    if parallel:
+        segments = []
+        for chunk, end in _parallel_segments(inp, duration, workdir, digest, target):
+            segments += chunk
+            yield {"segments": chunk, "progress": min(end / duration, 1.0) if duration else 1.0}
+        _write_transcript(out, segments)
+        shutil.rmtree(workdir, ignore_errors=True)
+    elif pool is not None:
+        # One request for the whole file: nothing to report before the end
+        with tempfile.TemporaryDirectory(prefix="transcribe-") as tmp:
+            segments = _whisper_segments(inp, Path(tmp) / out.stem)
+        _write_transcript(out, segments)
+        yield {"segments": segments, "progress": 1.0}
+    else:
+        # Remove .txt suffix for -of flag
+        base_out = out.parent / out.stem  # e.g., "transcript" instead of "transcript.txt"
+        # Generates base_out.txt, .json and .srt
+        for segment in _stream_whisper(inp, base_out, extra=("-otxt", "-oj", "-osrt")):
+            progress = min(segment["end"] / 1000 / duration, 1.0) if duration else None
+            yield {"segments": [segment], "progress": progress}
+        if out.exists() and out.with_suffix(".json").exists():
+            segment_file.write(out)
 
     # Verify TXT file was created
     if not out.exists():
-          raise FileNotFoundError(f"Transcript not generated at {out}")
\ No newline at end of file
+        raise FileNotFoundError(f"Transcript not generated at {out}")
+
+def transcribe(input_file: str, output_file: str, parallel: bool = None) -> None:
+    """Transcribe input_file into output_file (a .txt) with whisper.cpp.
+
+    parallel=None splits recordings of PARALLEL_MIN_SECONDS or more into
+    chunks transcribed concurrently (needs ffmpeg); False always transcribes
+    the whole file in one go. Jobs go to a persistent whisper-server when one
+    is available (see modules/whisper_server.py), else to a whisper-cli process.
+    """
+    for _ in transcribe_stream(input_file, output_file, parallel, progress=False):
+        pass
@@ -0,0 +1,166 @@
+# modules/whisper_server.py
+import os
+import json
+import queue
+import shlex
+import shutil
+import socket
+import subprocess
+import threading
+import time
+import urllib.request
+import uuid
+import atexit
+import logging
+from pathlib import Path
+from typing import Optional
+
+# Command that starts one whisper.cpp server (whisper.cpp's examples/server)
+WHISPER_SERVER = os.getenv("WHISPER_SERVER", str(Path("whisper.cpp") / "build" / "bin" / "Release" / "whisper-server.exe"))
+# Comma-separated URLs of servers started elsewhere; when set, none are launched
+WHISPER_SERVER_URLS = os.getenv("WHISPER_SERVER_URLS", "")
+# Servers to launch: "auto" = one per THREADS_PER_SERVER cores if WHISPER_SERVER exists, "0" = never
+SERVER_COUNT = os.getenv("TRANSCRIBE_SERVERS", "auto")
+THREADS_PER_SERVER = 4
+STARTUP_TIMEOUT = 60.0  # seconds for a server to load the model
+REQUEST_TIMEOUT = 3600.0  # seconds for one transcription
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _multipart(fields: dict, file_field: str, path: Path) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{path.name}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n".encode()
+    )
+    parts.append(path.read_bytes())
+    parts.append(f"\r\n--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+def _inference(url: str, audio: Path) -> list[dict]:
+    """POST one file to a server's /inference; segments with start/end in ms"""
+    body, content_type = _multipart({"response_format": "verbose_json", "temperature": "0.0"}, "file", audio)
+    request = urllib.request.Request(f"{url}/inference", data=body, headers={"Content-Type": content_type})
+    with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+        data = json.loads(response.read().decode("utf-8"))
+    if "error" in data:
+        raise ValueError(f"whisper-server: {data['error']}")
+    segments = data.get("segments")
+    if segments is None:  # servers without verbose_json only return the text
+        return [{"start": 0, "end": 0, "text": data.get("text", "")}]
+    return [
+        {"start": int(seg["start"] * 1000), "end": int(seg["end"] * 1000), "text": seg["text"]}
+        for seg in segments
+    ]
+
+
+class WhisperServerPool:
+    """whisper.cpp servers that keep the model loaded between jobs.
+
+    A server works on one request at a time, so concurrent transcribe() calls
+    are spread over the idle servers and wait while all of them are busy.
+    """
+
+    def __init__(self, urls: list[str], processes=()):
+        self.urls = list(urls)
+        self._processes = list(processes)
+        self._idle = queue.Queue()
+        for url in self.urls:
+            self._idle.put(url)
+
+    @classmethod
+    def launch(cls, model: Path, size: int, threads: int, convert: bool = False) -> "WhisperServerPool":
+        """Start `size` local servers for `model` and wait until they answer"""
+        processes, urls = [], []
+        for _ in range(size):
+            port = _free_port()
+            cmd = shlex.split(WHISPER_SERVER) + [
+                "-m", str(model), "--host", "127.0.0.1", "--port", str(port), "-t", str(threads),
+            ]
+            if convert:
+                cmd.append("--convert")  # let the server turn any input into 16 kHz WAV with ffmpeg
+            processes.append(subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            urls.append(f"http://127.0.0.1:{port}")
+        pool = cls(urls, processes)
+        try:
+            pool._wait_ready()
+        except Exception:
+            pool.close()
+            raise
+        return pool
+
+    def _wait_ready(self):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        for url, process in zip(self.urls, self._processes):
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"whisper-server exited with code {process.returncode}")
+                try:
+                    urllib.request.urlopen(url, timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"whisper-server at {url} did not start")
+                    time.sleep(0.2)
+
+    def transcribe(self, audio: Path) -> list[dict]:
+        """Transcribe one file on the next idle server"""
+        url = self._idle.get()
+        try:
+            return _inference(url, Path(audio))
+        finally:
+            self._idle.put(url)
+
+    def close(self):
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._processes = []
+
+
+_pool = None
+_pool_failed = False
+_pool_lock = threading.Lock()
+
+def _server_count() -> int:
+    if SERVER_COUNT != "auto":
+        return int(SERVER_COUNT)
+    executable = shlex.split(WHISPER_SERVER)[0]
+    if not (shutil.which(executable) or Path(executable).exists()):
+        return 0
+    return max(1, (os.cpu_count() or 1) // THREADS_PER_SERVER)
+
+def get_pool(model: Path, convert: bool = False) -> Optional[WhisperServerPool]:
+    """The shared server pool, started on first use. None when servers are disabled
+    or failed to start, in which case callers fall back to whisper-cli."""
+    global _pool, _pool_failed
+    if _pool is not None or _pool_failed:
+        return _pool
+    with _pool_lock:
+        if _pool is None and not _pool_failed:
+            if WHISPER_SERVER_URLS:
+                _pool = WhisperServerPool([u.strip().rstrip("/") for u in WHISPER_SERVER_URLS.split(",") if u.strip()])
+                return _pool
+            size = _server_count()
+            if not size:
+                _pool_failed = True
+                return None
+            try:
+                threads = max(1, (os.cpu_count() or 1) // size)
+                _pool = WhisperServerPool.launch(model, size, threads, convert)
+                atexit.register(_pool.close)
+                logging.info(f"Started {size} whisper-server(s) with {threads} threads each")
+            except (OSError, RuntimeError) as e:
+                logging.warning(f"whisper-server unavailable ({e}); using whisper-cli")
+                _pool_failed = True
+    return _pool
@@ -6,7 +6,7 @@ setup(
     packages=find_packages(),
     install_requires=[
         'PySimpleGUI==4.60.5',
-        'llama-cpp-python==0.1.0',  # Adjust version if needed
+        'llama-cpp-python==0.2.90',  # save_state/load_state and tokenize(add_bos=) used by the summary pool
         'faiss-cpu==1.7.4',  # or 'faiss-gpu'
         'python-telegram-bot==20.7',
     ],
@@ -0,0 +1,105 @@
+"""whisper-server pool and chunked transcription against benchmarks/stub_whisper_server.py"""
+import os
+import sys
+import json
+import struct
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from modules import transcribe, whisper_server
+
+STUB = Path(__file__).resolve().parent.parent / "benchmarks" / "stub_whisper_server.py"
+DELAY = 0.3  # seconds the stub spends per request
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="uses a shell-script ffmpeg stand-in")
+
+def _wav(path: Path, seconds: float) -> Path:
+    """Silent 16 kHz mono 16-bit WAV"""
+    data = bytes(int(seconds * 16000) * 2)
+    header = struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + len(data), b"WAVE", b"fmt ", 16, 1, 1,
+                         16000, 32000, 2, 16, b"data", len(data))
+    path.write_bytes(header + data)
+    return path
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(whisper_server, "WHISPER_SERVER", f"{sys.executable} {STUB} --delay {DELAY}")
+    pool = whisper_server.WhisperServerPool.launch(Path("stub.bin"), size=2, threads=1)
+    yield pool
+    pool.close()
+
+def test_pool_returns_segments_in_ms(pool, tmp_path):
+    segments = pool.transcribe(_wav(tmp_path / "a.wav", 12))
+    assert [(seg["start"], seg["end"]) for seg in segments] == [(0, 5000), (5000, 10000), (10000, 12000)]
+    assert segments[0]["text"] == " stub segment 1"
+
+def test_pool_spreads_requests_over_servers(pool, tmp_path):
+    audio = _wav(tmp_path / "a.wav", 5)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.transcribe(audio))) for _ in range(4)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    assert len(results) == 4 and all(len(segments) == 1 for segments in results)
+    # Two servers take two requests each; one server would need 4 x DELAY
+    assert 2 * DELAY <= elapsed < 4 * DELAY
+    assert pool._idle.qsize() == 2
+
+@pytest.fixture
+def ffmpeg(tmp_path, monkeypatch):
+    """ffmpeg stand-in: finds no silences and cuts by writing a silent WAV of the requested length"""
+    script = tmp_path / "ffmpeg"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import sys, struct\n"
+        "args = sys.argv[1:]\n"
+        "if '-t' in args:\n"
+        "    data = bytes(int(float(args[args.index('-t') + 1]) * 16000) * 2)\n"
+        "    header = struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + len(data), b'WAVE', b'fmt ', 16, 1, 1,\n"
+        "                         16000, 32000, 2, 16, b'data', len(data))\n"
+        "    open(args[-1], 'wb').write(header + data)\n"
+    )
+    script.chmod(0o755)
+    monkeypatch.setattr(transcribe, "FFMPEG", str(script))
+    monkeypatch.setattr(transcribe, "FFPROBE", str(script))  # only reached through _duration
+    monkeypatch.setattr(transcribe, "WHISPER_CLI", tmp_path / "missing-whisper-cli")  # no fallback
+    return script
+
+def test_chunked_transcription_on_server_pool(pool, ffmpeg, tmp_path, monkeypatch):
+    monkeypatch.setattr(transcribe, "_duration", lambda path: 700.0)
+    monkeypatch.setattr(whisper_server, "_pool", pool)
+
+    media = tmp_path / "meeting.raw"
+    media.write_bytes(b"not decoded by the stand-in")
+    out = tmp_path / "transcript.txt"
+    segments = transcribe.transcribe_parallel(media, out)
+
+    # Chunks [0, 300) and [300, 700): 60 + 80 five-second segments, shifted into place
+    assert len(segments) == 140
+    assert segments[60]["start"] == 300_000 and segments[-1]["end"] == 700_000
+    assert all(a["end"] == b["start"] for a, b in zip(segments, segments[1:]))
+    assert len(out.read_text(encoding="utf-8").splitlines()) == 140
+    assert len(json.loads(out.with_suffix(".json").read_text(encoding="utf-8"))["transcription"]) == 140
+    assert not (tmp_path / transcribe.CHECKPOINT_DIR).exists()
+
+def test_short_file_on_server_pool_reports_progress(pool, ffmpeg, tmp_path, monkeypatch):
+    monkeypatch.setattr(transcribe, "_duration", lambda path: 100.0)
+    monkeypatch.setattr(whisper_server, "_pool", pool)
+    media = tmp_path / "note.raw"
+    media.write_bytes(b"not decoded by the stand-in")
+
+    # Sent in ~30 s chunks, one item each as the servers return them
+    events = list(transcribe.transcribe_stream(str(media), str(tmp_path / "transcript.txt")))
+    assert [event["progress"] for event in events] == [0.3, 0.6, 1.0]
+    assert sum(len(event["segments"]) for event in events) == 20
+    assert events[-1]["segments"][-1]["end"] == 100_000
+
+    # Without progress the file goes to a server in one request
+    events = list(transcribe.transcribe_stream(str(media), str(tmp_path / "whole.txt"), progress=False))
+    assert len(events) == 1 and events[0]["progress"] == 1.0